@@ -1,4 +1,19 @@
 import streamlit as st
+import pandas as pd
+
+from views import configure_logging, start_prefetch
 
 st.header('Curious Learning')
 st.text('Streamlit app for looking at assessment and survey data from H5P version')
+
+configure_logging()
+
+# start warming the pages' default views as soon as the app is opened
+prefetcher = start_prefetch()
+
+with st.expander('Prefetch status'):
+    status = prefetcher.status()
+    if status:
+        st.dataframe(pd.DataFrame.from_dict(status, orient='index'))
+    else:
+        st.text('Nothing prefetched yet')
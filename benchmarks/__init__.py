@@ -0,0 +1 @@
+"""Benchmarks for the LRS loaders. Run them from the repo root with ``python -m``."""
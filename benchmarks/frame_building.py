@@ -0,0 +1,76 @@
+"""Compare building a loader frame page by page against building it once.
+
+"concat" is the old loader path: ``pd.json_normalize`` every 100-statement
+page and ``pd.concat`` it onto the frame so far. "columns" is
+``lrs.frames.statements_frame``. Each case runs in a fresh process so peak
+RSS is its own::
+
+    python -m benchmarks.frame_building 10000 50000 100000
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_statements
+from lrs.frames import statements_frame
+
+PAGE_SIZE = 100
+COLUMNS = ['timestamp', 'actor.name', 'actor.account.name',
+           'result.score.raw', 'result.duration', 'verb.display.en-US',
+           'actor.account.homePage', 'result.score.max']
+
+
+def concat_pages(statements):
+    df = pd.DataFrame()
+    for i in range(0, len(statements), PAGE_SIZE):
+        df_statements = pd.json_normalize(statements[i:i + PAGE_SIZE])
+        df = pd.concat([df, df_statements]).reset_index(drop=True)
+    return df[COLUMNS]
+
+
+def build_columns(statements):
+    return statements_frame(statements, COLUMNS)
+
+
+PATHS = {"concat": concat_pages, "columns": build_columns}
+
+
+def _run(path, n, results):
+    statements = make_statements(n)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    PATHS[path](statements)
+    wall = time.perf_counter() - started
+    # ru_maxrss is in KiB on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((wall, peak / 1024, (peak - baseline) / 1024))
+
+
+def run(path, n):
+    """Return ``(seconds, peak RSS MiB, RSS growth MiB)`` for one case."""
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    process = ctx.Process(target=_run, args=(path, n, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("counts", nargs="*", type=int, default=[1000, 10000, 50000])
+    args = parser.parse_args(argv)
+
+    print(f"{'statements':>10} {'path':<8} {'seconds':>8} {'peak MiB':>9} {'growth MiB':>11}")
+    for n in args.counts:
+        for path in PATHS:
+            wall, peak, growth = run(path, n)
+            print(f"{n:>10} {path:<8} {wall:>8.2f} {peak:>9.1f} {growth:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
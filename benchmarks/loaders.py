@@ -0,0 +1,102 @@
+"""Run the loaders end to end against ``benchmarks.mock_lrs``.
+
+For each statement count a mock LRS is filled with synthetic statements
+and every loader runs once, cold, in a fresh process with an empty store,
+then once more warm. Reported are wall times, the requests and bytes the
+mock LRS served, and the peak RSS of the loader process::
+
+    python -m benchmarks.loaders 10000 100000 1000000 --latency 0.02
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.mock_lrs import PATH, MockLRS
+from lrs import StatementStore, loaders
+
+
+def load_actor_set(store, base_url, lang, ass_type, since, until):
+    """``loaders.load_actor_set`` for an assessment, called like the other loaders."""
+    activity = loaders.activity_id("assessment", lang, ass_type)
+    return loaders.load_actor_set(store, base_url, activity, since, until)
+
+
+# name: (loader, language, assessment)
+LOADERS = {
+    "completed": (loaders.load_assessment_completed_data, "english", "letter-sound"),
+    "actor_set": (load_actor_set, "english", "letter-sound"),
+    "survey": (loaders.load_survey_data, "english", "nonliterate-ses"),
+    "assessment_alt": (loaders.load_assessment_data_alt, "english", "letter-sound"),
+}
+
+
+def _run(name, store_path, base_url, since, until, results):
+    load, lang, ass_type = LOADERS[name]
+    store = StatementStore(store_path)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    started = time.perf_counter()
+    result = load(store, base_url, lang, ass_type, since, until)
+    cold = time.perf_counter() - started
+    started = time.perf_counter()
+    load(store, base_url, lang, ass_type, since, until)
+    warm = time.perf_counter() - started
+
+    # ru_maxrss is in KiB on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((cold, warm, len(result), peak / 1024, (peak - baseline) / 1024))
+
+
+def run(lrs, base_url, name, since, until):
+    """Run one loader in a fresh process with a fresh store."""
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    with tempfile.TemporaryDirectory() as tmp:
+        store_path = os.path.join(tmp, "bench.sqlite3")
+        requests, sent = lrs.requests, lrs.bytes_sent
+        process = ctx.Process(target=_run,
+                              args=(name, store_path, base_url, since, until, results))
+        process.start()
+        result = results.get()
+        process.join()
+    cold, warm, rows, peak, growth = result
+    return {"loader": name, "cold": cold, "warm": warm, "rows": rows,
+            "requests": lrs.requests - requests, "bytes": lrs.bytes_sent - sent,
+            "peak": peak, "growth": growth}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("counts", nargs="*", type=int, default=[10000, 100000, 1000000])
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--actors", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds the mock LRS adds to each request")
+    parser.add_argument("--loaders", nargs="+", choices=list(LOADERS), default=list(LOADERS))
+    args = parser.parse_args(argv)
+
+    # whole days, ending at midnight, so every loader covers all statements
+    end = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    since, until = (end - timedelta(days=args.days)).date(), end.date()
+
+    print(f"{'statements':>10} {'loader':<15} {'cold s':>8} {'warm s':>8} {'rows':>8} "
+          f"{'requests':>9} {'MB':>8} {'peak MiB':>9} {'growth MiB':>11}")
+    for n in args.counts:
+        lrs = MockLRS(n, days=args.days, end=end, actor_count=args.actors, latency=args.latency)
+        server = lrs.serve()
+        base_url = f"http://127.0.0.1:{server.server_port}{PATH}"
+        for name in args.loaders:
+            r = run(lrs, base_url, name, since, until)
+            print(f"{n:>10} {r['loader']:<15} {r['cold']:>8.2f} {r['warm']:>8.3f} {r['rows']:>8} "
+                  f"{r['requests']:>9} {r['bytes'] / 1e6:>8.2f} {r['peak']:>9.1f} "
+                  f"{r['growth']:>11.1f}", flush=True)
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
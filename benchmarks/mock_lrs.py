@@ -0,0 +1,201 @@
+"""A local stand-in for the LRS statements API, serving synthetic statements.
+
+The statements are the ones ``benchmarks.synthetic`` makes, newest first,
+paged like the real LRS with a ``more`` link relative to the host. Only a
+compact index is kept in memory; each statement is made again when it is
+served, so a million of them fit comfortably. ``since``/``until`` (on
+``stored``), ``activity``, ``related_activities``, ``verb`` and ``agent``
+are honoured, responses are gzipped when asked, ``latency`` adds a delay to
+every request and ``fail`` can answer chosen requests with an error. As in
+the xAPI spec, ``related_activities`` matches the activity exactly, as the
+object or any of the context activities::
+
+    python -m benchmarks.mock_lrs --statements 100000 --port 8765
+
+then point ``db_credentials.cl_lrs_base_url`` at
+``http://127.0.0.1:8765/xAPI/statements``.
+"""
+import argparse
+import bisect
+import gzip
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from benchmarks.synthetic import make_statement
+from lrs.store import actor_key, to_utc
+
+PAGE_SIZE = 100
+PATH = "/xAPI/statements"
+
+
+def related_ids(statement):
+    """The activity ids ``related_activities`` matches on: the object and every context activity."""
+    ids = {statement["object"]["id"]}
+    context = statement.get("context", {}).get("contextActivities", {})
+    for activities in context.values():
+        if isinstance(activities, dict):
+            activities = [activities]
+        ids.update(activity["id"] for activity in activities)
+    return ids
+
+
+class MockLRS:
+    """``n`` synthetic statements stored over the ``days`` days before ``end``."""
+
+    def __init__(self, n, days=30, seed=0, end=None, actor_count=1000,
+                 page_size=PAGE_SIZE, latency=0.0, fail=None):
+        self.seed = seed
+        self.actor_count = actor_count
+        self.page_size = page_size
+        self.latency = latency
+        # called with the query of every request, returns an HTTP status to
+        # answer with instead, or None
+        self.fail = fail
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+        end = end or datetime.now(timezone.utc).replace(microsecond=0)
+        rng = random.Random(seed)
+        span = int(timedelta(days=days).total_seconds())
+        # stored times newest first, and the same negated for bisect
+        self.stored = sorted((end - timedelta(seconds=rng.randrange(span)) for _ in range(n)),
+                             reverse=True)
+        self._keys = [-s.timestamp() for s in self.stored]
+
+        # positions of the statements per activity, related activity, verb and actor
+        self.by_activity = {}
+        self.by_related = {}
+        self.by_verb = {}
+        self.by_actor = {}
+        for i in range(n):
+            statement = self.statement(i)
+            self.by_activity.setdefault(statement["object"]["id"], []).append(i)
+            for activity in related_ids(statement):
+                self.by_related.setdefault(activity, []).append(i)
+            self.by_verb.setdefault(statement["verb"]["id"], []).append(i)
+            self.by_actor.setdefault(actor_key(statement["actor"]), []).append(i)
+
+    def statement(self, i):
+        """Return statement ``i``, the same one every time."""
+        rng = random.Random(self.seed << 32 | i)
+        return make_statement(rng, self.stored[i], self.actor_count)
+
+    def candidates(self, query):
+        """Positions that can match ``query``, from the narrowest index."""
+        if "agent" in query:
+            return self.by_actor.get(actor_key(json.loads(query["agent"])), [])
+        if "activity" in query:
+            if query.get("related_activities") == "true":
+                return self.by_related.get(query["activity"], [])
+            return self.by_activity.get(query["activity"], [])
+        if "verb" in query:
+            return self.by_verb.get(query["verb"], [])
+        return range(len(self.stored))
+
+    def page(self, query):
+        """Return the response body for one statements request."""
+        cursor = int(query.pop("cursor", 0))
+        # stored in (since, until] is positions [first, last)
+        first, last = 0, len(self.stored)
+        if "until" in query:
+            first = bisect.bisect_left(self._keys, -to_utc(query["until"]).timestamp())
+        if "since" in query:
+            last = bisect.bisect_left(self._keys, -to_utc(query["since"]).timestamp())
+        first = max(first, cursor)
+
+        candidates = self.candidates(query)
+        start = bisect.bisect_left(candidates, first)
+        verb = query.get("verb") if "agent" in query or "activity" in query else None
+        activity = query.get("activity") if "agent" in query else None
+        related = query.get("related_activities") == "true"
+
+        statements = []
+        more = ""
+        for i in candidates[start:]:
+            if i >= last:
+                break
+            if len(statements) == self.page_size:
+                more = f"{PATH}?{urlencode(dict(query, cursor=i))}"
+                break
+            statement = self.statement(i)
+            if verb and statement["verb"]["id"] != verb:
+                continue
+            if activity and activity not in (related_ids(statement) if related
+                                             else {statement["object"]["id"]}):
+                continue
+            statements.append(statement)
+        return json.dumps({"statements": statements, "more": more}).encode("utf-8")
+
+    def count(self, nbytes):
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += nbytes
+
+    def serve(self, host="127.0.0.1", port=0):
+        """Serve on a background thread; returns the server, ``server_port`` is the port."""
+        lrs = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path != PATH:
+                    self.send_error(404)
+                    return
+                if lrs.latency:
+                    time.sleep(lrs.latency)
+                query = dict(parse_qsl(url.query))
+                status = lrs.fail(dict(query)) if lrs.fail else None
+                if status:
+                    self.send_error(status)
+                    return
+                body = lrs.page(query)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body, compresslevel=5)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                lrs.count(len(body))
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--statements", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--actors", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to each request")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    lrs = MockLRS(args.statements, days=args.days, actor_count=args.actors,
+                  page_size=args.page_size, latency=args.latency)
+    server = lrs.serve(port=args.port)
+    print(f"serving {args.statements} statements on "
+          f"http://127.0.0.1:{server.server_port}{PATH}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
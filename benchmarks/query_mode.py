@@ -0,0 +1,47 @@
+"""Compare the related-activity and scan query modes of ``sync_activity``.
+
+Each mode syncs the same activity and date range into a throwaway store and
+reports requests, bytes transferred and wall time::
+
+    python -m benchmarks.query_mode BASE_URL ACTIVITY SINCE UNTIL
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from lrs import StatementStore, client
+from lrs.sync import sync_activity
+
+
+def run(base_url, activity, since, until, mode):
+    """Sync once in ``mode`` and return what it cost."""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = StatementStore(os.path.join(tmp, "bench.sqlite3"))
+        client.REQUEST_LOG.clear()
+        started = time.perf_counter()
+        sync_activity(store, base_url, activity, since, until, mode=mode)
+        wall = time.perf_counter() - started
+        kept = len(store.statements(since, until, activity=activity, related=True))
+    summary = client.request_summary()
+    return {"mode": mode, "wall": wall, "requests": summary["requests"],
+            "bytes": summary["bytes"], "fetched": summary["statements"], "kept": kept}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base_url")
+    parser.add_argument("activity")
+    parser.add_argument("since")
+    parser.add_argument("until")
+    args = parser.parse_args(argv)
+
+    print(f"{'mode':<8} {'wall s':>8} {'requests':>9} {'MB':>9} {'fetched':>9} {'kept':>9}")
+    for mode in ("related", "scan"):
+        r = run(args.base_url, args.activity, args.since, args.until, mode)
+        print(f"{r['mode']:<8} {r['wall']:>8.2f} {r['requests']:>9} {r['bytes'] / 1e6:>9.2f} "
+              f"{r['fetched']:>9} {r['kept']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Synthetic xAPI statements shaped like the ones the H5P apps send."""
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+BASE_ACTIVITY = "https://data.curiouslearning.org/xAPI/activities"
+VERBS = ("initialized", "answered", "completed")
+LANGUAGES = ("english", "zulu", "hausa", "bangla", "french")
+PLACES = (("Kano", "Kano", "NG", 12.0, 8.5), ("Durban", "KwaZulu-Natal", "ZA", -29.9, 31.0),
+          ("Dhaka", "Dhaka", "BD", 23.8, 90.4), ("Lagos", "Lagos", "NG", 6.5, 3.4))
+
+
+def make_statement(rng, stored, actor_count=1000):
+    """Return one statement stored at ``stored``."""
+    user = rng.randrange(actor_count)
+    verb = rng.choice(VERBS)
+    kind, item = rng.choice((("assessment", "letter-sound"), ("assessment", "pseudo-word"),
+                             ("survey", "nonliterate-ses")))
+    activity = f"{BASE_ACTIVITY}/{kind}/{rng.choice(LANGUAGES)}/{item}"
+    city, region, country, lat, lng = rng.choice(PLACES)
+    timestamp = stored - timedelta(seconds=rng.randrange(120))
+    statement = {
+        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "actor": {"objectType": "Agent", "name": f"session-{user}",
+                  "account": {"homePage": rng.choice(("cr-app", "web")), "name": f"user-{user}"}},
+        "verb": {"id": f"http://adlnet.gov/expapi/verbs/{verb}", "display": {"en-US": verb}},
+        "object": {"objectType": "Activity", "id": activity,
+                   "definition": {"description": {"en-US": item}},
+                   "location": {"lat": f"{lat + rng.uniform(-1, 1):.4f}",
+                                "lng": f"{lng + rng.uniform(-1, 1):.4f}",
+                                "city": city, "region": region, "country": country}},
+        "context": {"contextActivities": {"parent": [{"id": activity}]},
+                    "extensions": {"http://id.tincanapi.com/extension/ending-point": "x" * 40}},
+        "timestamp": timestamp.isoformat().replace("+00:00", "Z"),
+        "stored": stored.isoformat().replace("+00:00", "Z"),
+        "authority": {"objectType": "Agent", "name": "h5p", "mbox": "mailto:h5p@example.org"},
+        "version": "1.0.0",
+    }
+    if verb == "answered":
+        question = rng.randrange(20)
+        statement["object"]["id"] = f"{activity}/q{question}"
+        statement["object"]["definition"] = {
+            "description": {"en-US": f"Question {question}"},
+            "interactionType": "choice",
+            "choices": [{"id": f"option-{i}", "description": {"en-US": f"answer {i}"}}
+                        for i in range(4)]}
+        statement["result"] = {"response": f"option-{rng.randrange(4)}",
+                               "duration": f"PT{rng.uniform(1, 30):.2f}S"}
+    elif verb == "completed":
+        statement["result"] = {"score": {"raw": rng.randrange(0, 101), "max": 100},
+                               "duration": f"PT{rng.uniform(60, 600):.2f}S"}
+    return statement
+
+
+def make_statements(n, days=30, seed=0, end=None, actor_count=1000):
+    """Return ``n`` statements spread over ``days`` days, newest first."""
+    rng = random.Random(seed)
+    end = end or datetime.now(timezone.utc).replace(microsecond=0)
+    span = int(timedelta(days=days).total_seconds())
+    stored = sorted((end - timedelta(seconds=rng.randrange(span)) for _ in range(n)),
+                    reverse=True)
+    return [make_statement(rng, s, actor_count) for s in stored]
@@ -0,0 +1 @@
+# keeps the repo root importable (lrs, views) when running plain `pytest`
@@ -0,0 +1,2 @@
+"""Fetching and storing Curious Learning LRS statements."""
+from lrs.store import StatementStore
@@ -0,0 +1,138 @@
+"""Load LRS history into the statement store from the command line.
+
+    python -m lrs.backfill --since 2022-05-14
+
+Loading months of statements from a page ties up a Streamlit session for
+as long as the crawl takes. A backfill runs outside the web process and
+writes to the same store file the pages read. It scans every statement
+stored in the range, cut into shards fetched ``--workers`` at a time with
+at most ``--rate`` requests a second. Each finished shard is checkpointed
+in the store, so a backfill that is stopped picks up where it left off when
+run again. Once every shard is in, the range is recorded as synced for the
+scan and for every query the pages make (``lrs.loaders.page_scopes``), and
+the pages only fetch what arrived after it.
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from datetime import date, timedelta
+
+from lrs.client import MAX_IN_FLIGHT, iter_statements, make_session
+from lrs.loaders import page_scopes
+from lrs.store import DEFAULT_PATH, StatementStore
+from lrs.sync import add_in_batches, missing_shards, scope_key
+
+logger = logging.getLogger(__name__)
+
+# the first day that data is correct
+ORIGIN_DATE = date(2022, 5, 14)
+SHARD_SIZE = timedelta(days=1)
+SECRETS = os.path.join(".streamlit", "secrets.toml")
+
+
+class Progress:
+    """Logs how far a backfill has got after each shard."""
+
+    def __init__(self, total, done=0):
+        self.total = total
+        self.done = done
+        self.fetched = 0
+        self.statements = 0
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def update(self, shard, statements):
+        """Count a finished shard and log the totals so far."""
+        with self._lock:
+            self.done += 1
+            self.fetched += 1
+            self.statements += statements
+            elapsed = time.monotonic() - self._started
+            remaining = elapsed / self.fetched * (self.total - self.done)
+            logger.info("%s..%s: %d new statements | %d/%d shards, %d new statements, "
+                        "%.0f statements/s, %s left",
+                        shard[0].date(), shard[1].date(), statements, self.done, self.total,
+                        self.statements, self.statements / max(elapsed, 1e-9),
+                        timedelta(seconds=round(remaining)))
+
+
+def backfill(store, base_url, since, until, shard_size=SHARD_SIZE, workers=MAX_IN_FLIGHT,
+             rate=None):
+    """Scan every statement stored in ``(since, until]`` into ``store``.
+
+    Returns the number of statements that were new to the store.
+    """
+    params = {}
+    scope = scope_key(params)
+    shards, coverage = missing_shards(store, params, since, until, shard_size)
+    done = store.backfilled(scope)
+    todo = [shard for shard in shards if shard not in done]
+    progress = Progress(len(shards), len(shards) - len(todo))
+    logger.info("backfilling %d shards, %d already fetched", len(shards), len(shards) - len(todo))
+    session = make_session(workers, rate)
+
+    def fetch(shard):
+        added = add_in_batches(store, iter_statements(session, base_url, params, *shard))
+        store.mark_backfilled(scope, *shard, added)
+        progress.update(shard, added)
+        return added
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = [pool.submit(fetch, shard) for shard in todo]
+        finished, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        # re-raises the first failure, the shards done so far stay checkpointed
+        added = sum(future.result() for future in finished)
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+    if coverage is not None:
+        for each in [params] + page_scopes():
+            store.extend_coverage(scope_key(each), *coverage)
+    store.clear_backfilled(scope)
+    return added
+
+
+def default_base_url():
+    """The LRS statements URL from ``CL_LRS_BASE_URL`` or the Streamlit secrets."""
+    if os.environ.get("CL_LRS_BASE_URL"):
+        return os.environ["CL_LRS_BASE_URL"]
+    if os.path.exists(SECRETS):
+        try:
+            import tomllib
+        except ImportError:
+            # before Python 3.11, the toml package Streamlit already installs
+            import toml as tomllib
+        with open(SECRETS, encoding="utf-8") as f:
+            return tomllib.loads(f.read()).get("db_credentials", {}).get("cl_lrs_base_url")
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--since", type=date.fromisoformat, default=ORIGIN_DATE)
+    parser.add_argument("--until", type=date.fromisoformat, default=date.today() + timedelta(days=1))
+    parser.add_argument("--store", default=DEFAULT_PATH)
+    parser.add_argument("--base-url", default=default_base_url(),
+                        help="LRS statements URL, defaults to CL_LRS_BASE_URL or the secrets")
+    parser.add_argument("--shard-days", type=float, default=SHARD_SIZE.days)
+    parser.add_argument("--workers", type=int, default=MAX_IN_FLIGHT,
+                        help="shards fetched at once, capped by CL_LRS_MAX_IN_FLIGHT")
+    parser.add_argument("--rate", type=float, default=None, help="most requests a second")
+    args = parser.parse_args(argv)
+    if not args.base_url:
+        parser.error("no LRS URL, pass --base-url or set CL_LRS_BASE_URL")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    # the per-request lines would drown out the progress
+    logging.getLogger("lrs.client").setLevel(logging.WARNING)
+    added = backfill(StatementStore(args.store), args.base_url, args.since, args.until,
+                     timedelta(days=args.shard_days), args.workers, args.rate)
+    logger.info("done, %d new statements", added)
+
+
+if __name__ == "__main__":
+    main()
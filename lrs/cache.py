@@ -0,0 +1,206 @@
+"""Process wide cache of loader results, bounded by memory rather than entries.
+
+Entries are keyed on the loader and its non-date arguments and remember the
+``(since, until]`` stored-time window they were loaded for. A request for a
+window inside a cached one is answered by slicing the cached frame on the
+``stored`` time of its rows, so a 30 day view can come out of a cached 90
+day load. Windows that reach into the last ``lrs.sync.SETTLE_TIME``, which
+the sync has not fetched yet, go stale after a TTL; older windows never
+change and stay until evicted, least recently used first, once the cache
+grows past ``max_bytes``. A stale window is kept until it is loaded again,
+so that loading it again only has to add the rows stored since (see
+``get_stale`` and ``combine``).
+"""
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from lrs import timing
+from lrs.store import to_utc
+from lrs.sync import SETTLE_TIME
+
+MAX_BYTES = int(os.environ.get("CL_LRS_CACHE_MB", 512)) * 2**20
+# seconds before an entry covering the current time is reloaded
+LIVE_TTL = int(os.environ.get("CL_LRS_CACHE_TTL", 600))
+
+
+class _Entry:
+
+    def __init__(self, since, until, df, stored, live, watermark=None):
+        self.since = since
+        self.until = until
+        self.df = df
+        self.stored = stored
+        self.watermark = watermark
+        self.live = live
+        self.stale = False
+        self.loaded = self.used = time.monotonic()
+        self.nbytes = int(df.memory_usage(deep=True).sum())
+        if stored is not None:
+            self.nbytes += int(stored.memory_usage(deep=True))
+
+
+class FrameCache:
+    """Size bounded cache of DataFrames covering stored-time windows.
+
+    Frames handed out are shared with the cache and must not be modified.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES, live_ttl=LIVE_TTL):
+        self.max_bytes = max_bytes
+        self.live_ttl = live_ttl
+        self.nbytes = 0
+        self.counters = {"hits": 0, "slices": 0, "misses": 0,
+                         "evictions": 0, "expirations": 0}
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, since, until):
+        """Return the frame for ``key`` over ``(since, until]``, or None."""
+        since, until = to_utc(since), to_utc(until)
+        with self._lock:
+            entries = self._entries.get(key, [])
+            now = time.monotonic()
+            for entry in entries:
+                if entry.live and not entry.stale and now - entry.loaded > self.live_ttl:
+                    entry.stale = True
+                    self.counters["expirations"] += 1
+            entries = [e for e in entries if not e.stale]
+
+            exact = [e for e in entries if (e.since, e.until) == (since, until)]
+            covering = [e for e in entries if e.stored is not None
+                        and e.since <= since and until <= e.until]
+            if exact:
+                entry = exact[0]
+                self.counters["hits"] += 1
+                timing.count("cache_hits")
+            elif covering:
+                entry = min(covering, key=lambda e: e.until - e.since)
+                self.counters["slices"] += 1
+                timing.count("cache_slices")
+            else:
+                self.counters["misses"] += 1
+                timing.count("cache_misses")
+                return None
+            entry.used = now
+
+        if entry in exact:
+            return entry.df
+        rows = ((entry.stored > since) & (entry.stored <= until)).to_numpy()
+        return entry.df[rows].reset_index(drop=True)
+
+    def get_stale(self, key, since, until):
+        """Return ``(df, stored, watermark)`` of a stale entry for ``(since, until]``, or None.
+
+        Only entries for exactly that window that were put with their
+        ``stored`` times are returned.
+        """
+        since, until = to_utc(since), to_utc(until)
+        with self._lock:
+            for entry in self._entries.get(key, []):
+                if entry.stale and entry.stored is not None and (
+                        (entry.since, entry.until) == (since, until)):
+                    entry.used = time.monotonic()
+                    return entry.df, entry.stored, entry.watermark
+        return None
+
+    def put(self, key, since, until, df, stored=None, watermark=None):
+        """Cache ``df`` as the result for ``key`` over ``(since, until]``.
+
+        ``stored`` is the stored time of each row; without it the entry
+        only answers requests for exactly the same window. ``watermark`` is
+        the stored time up to which the rows were complete when loaded.
+        """
+        since, until = to_utc(since), to_utc(until)
+        # the sync stops short of the last few minutes, so a window ending in
+        # them is incomplete until it is loaded again
+        live = until > datetime.now(timezone.utc) - SETTLE_TIME
+        entry = _Entry(since, until, df, stored, live, watermark)
+        if entry.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            entries = self._entries.setdefault(key, [])
+            # drop entries the new one makes redundant
+            for old in list(entries):
+                if (old.since, old.until) == (since, until) or (
+                        stored is not None and since <= old.since and old.until <= until):
+                    self._remove(key, old)
+            entries = self._entries.setdefault(key, [])
+            entries.append(entry)
+            self.nbytes += entry.nbytes
+            self._evict()
+
+    def expire_live(self):
+        """Mark every entry whose window reaches past the time it was loaded as stale."""
+        with self._lock:
+            for entries in self._entries.values():
+                for entry in entries:
+                    if entry.live and not entry.stale:
+                        entry.stale = True
+                        self.counters["expirations"] += 1
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """Return the counters plus current size."""
+        with self._lock:
+            entries = sum(len(e) for e in self._entries.values())
+            return dict(self.counters, entries=entries, bytes=self.nbytes)
+
+    def _remove(self, key, entry):
+        entries = self._entries[key]
+        entries.remove(entry)
+        self.nbytes -= entry.nbytes
+        if not entries:
+            del self._entries[key]
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes:
+            key, entry = min(((k, e) for k, entries in self._entries.items() for e in entries),
+                             key=lambda item: item[1].used)
+            self._remove(key, entry)
+            self.counters["evictions"] += 1
+
+
+def combine(newer, older):
+    """Put the ``(df, stored)`` rows of ``newer`` ahead of those of ``older``.
+
+    Categorical columns stay categorical even when the two frames saw
+    different categories.
+    """
+    if len(newer[0].index) == 0:
+        return older
+    if len(older[0].index) == 0:
+        return newer
+    df = pd.concat([newer[0], older[0]], ignore_index=True)
+    for column in df.columns:
+        if (isinstance(older[0].dtypes.get(column), pd.CategoricalDtype)
+                and not isinstance(df[column].dtype, pd.CategoricalDtype)):
+            df[column] = df[column].astype("category")
+    stored = pd.concat([newer[1], older[1]], ignore_index=True)
+    return df, stored
+
+
+def stored_times(values):
+    """Parse a column of statement ``stored`` strings for ``FrameCache.put``."""
+    return pd.to_datetime(values, utc=True, format="ISO8601")
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache():
+    """Return the process wide cache, creating it on first use."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = FrameCache()
+        return _shared_cache
@@ -0,0 +1,63 @@
+"""Cleaning shared by the assessment and survey data pages."""
+import pandas as pd
+
+from lrs.schema import apply_schema
+
+CHOICES = 'object.definition.choices'
+
+RENAME = {"object.location.lat": "lat",
+          "object.location.lng": "lon",
+          'verb.display.en-US': "type",
+          'actor.name': "webSessionId",
+          'actor.account.name': "clUserId",
+          'actor.account.homePage': "userSource",
+          'object.definition.description.en-US': "question",
+          'result.response': "answer",
+          'result.duration': "responseTime",
+          'result.score.raw': "scoreRaw",
+          'result.score.max': "scoreRawMax",
+          'object.location.city': "city",
+          'object.location.region': "region",
+          'object.location.country': "country",
+          'object.id': "itemURL"}
+
+
+def expand_choices(df):
+    """Return the choices of answered statements as one column per choice id.
+
+    The frame is indexed like ``df`` and only has rows for statements that
+    had choices.
+    """
+    answered = df.loc[df['verb.display.en-US'] == 'answered', CHOICES]
+    choices = answered.explode().dropna()
+    if choices.empty:
+        return pd.DataFrame(index=df.index[:0])
+    options = pd.DataFrame({'row': choices.index,
+                            'id': [c['id'] for c in choices],
+                            'text': [c.get('description', {}).get('en-US') for c in choices]})
+    # a choice id repeated within a statement keeps its last description
+    options = options.drop_duplicates(['row', 'id'], keep='last')
+    return options.pivot(index='row', columns='id', values='text').rename_axis(index=None,
+                                                                             columns=None)
+
+
+def data_clean_up(df, options):
+    """Clean the data up.
+
+    ``df`` holds flattened statement columns (see ``lrs.frames``). The
+    choices of answered statements are spread into their own columns, of
+    which only the ids in ``options`` are kept, columns get their display
+    names and the types in ``lrs.schema``.
+    """
+    if df.shape[0] > 0:
+        # extract the options and place them in thier own column
+        if CHOICES in df.columns:
+            expanded = expand_choices(df)
+            df = df.drop(columns=CHOICES)
+            for option in options:
+                if option in expanded.columns:
+                    df[option] = expanded[option]
+
+        df = apply_schema(df.rename(columns=RENAME))
+
+    return df
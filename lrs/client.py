@@ -0,0 +1,170 @@
+"""HTTP client for the LRS statements API.
+
+Every query goes through one shared, pooled ``requests.Session`` so pages
+reuse keep-alive connections instead of paying a TCP/TLS handshake per page.
+The session asks for gzip, times out instead of hanging, and retries with
+exponential backoff when the LRS answers 429 or a 5xx. No more than
+``MAX_IN_FLIGHT`` requests are open at once across the process. Response bodies are
+decoded as they stream in, and each request is logged with its latency and
+size in ``REQUEST_LOG``. Sessions for bulk jobs can also be held to a number
+of requests a second (see ``RateLimiter``).
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from urllib.parse import urlencode, urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from lrs import timing
+from lrs.jsonstream import iter_statements as _decode_statements
+from lrs.store import utc_iso
+
+logger = logging.getLogger(__name__)
+
+# how many requests may be waiting on the LRS at the same time
+MAX_IN_FLIGHT = int(os.environ.get("CL_LRS_MAX_IN_FLIGHT", 8))
+
+# (connect, read) timeouts in seconds
+TIMEOUT = (float(os.environ.get("CL_LRS_CONNECT_TIMEOUT", 10)),
+           float(os.environ.get("CL_LRS_READ_TIMEOUT", 120)))
+
+CHUNK_SIZE = 1 << 16
+
+RETRY = Retry(total=5,
+              backoff_factor=0.5,
+              status_forcelist=(429, 500, 502, 503, 504),
+              allowed_methods=("GET",),
+              respect_retry_after_header=True)
+
+# one entry per request: url, status, wait (time to headers), seconds (time
+# spent fetching and decoding the body), bytes (on the wire), statements
+REQUEST_LOG = deque(maxlen=10000)
+
+_shared_session = None
+_shared_lock = threading.Lock()
+
+# process wide cap on requests open against the LRS, however many shards
+# and per-actor workers are running
+_in_flight = threading.BoundedSemaphore(MAX_IN_FLIGHT)
+
+
+class RateLimiter:
+    """Spaces out requests to at most ``rate`` a second, across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Sleep until the next request may go out."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        time.sleep(start - now)
+
+
+class _ThrottledAdapter(HTTPAdapter):
+
+    def __init__(self, limiter, **kwargs):
+        self.limiter = limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        # retries happen further down, so they are not counted
+        self.limiter.wait()
+        return super().send(request, **kwargs)
+
+
+def make_session(max_in_flight=MAX_IN_FLIGHT, rate=None):
+    """Return a session whose connection pool fits ``max_in_flight`` requests.
+
+    With a ``rate`` it sends no more than that many requests a second.
+    """
+    session = requests.Session()
+    session.headers["Accept-Encoding"] = "gzip"
+    if rate:
+        adapter = _ThrottledAdapter(RateLimiter(rate), pool_connections=1,
+                                    pool_maxsize=max_in_flight, max_retries=RETRY)
+    else:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight,
+                              max_retries=RETRY)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def shared_session():
+    """Return the process wide session, creating it on first use."""
+    global _shared_session
+    with _shared_lock:
+        if _shared_session is None:
+            _shared_session = make_session()
+        return _shared_session
+
+
+def get_statements(session, url):
+    """Yield the statements of one result page; returns its ``more`` link."""
+    with _in_flight:
+        rest, metric = yield from _get_statements(session, url)
+
+    REQUEST_LOG.append(metric)
+    timing.record_request(metric)
+    logger.info("GET %s %d wait=%.3fs total=%.3fs bytes=%d statements=%d",
+                url, metric["status"], metric["wait"], metric["seconds"],
+                metric["bytes"], metric["statements"])
+    return rest.get("more")
+
+
+def _get_statements(session, url):
+    started = time.perf_counter()
+    with session.get(url, stream=True, timeout=TIMEOUT) as response:
+        response.raise_for_status()
+        decoder = _decode_statements(response.iter_content(CHUNK_SIZE))
+        count = 0
+        seconds = time.perf_counter() - started
+        while True:
+            # only time spent in here counts, not time the caller takes
+            # between statements
+            started = time.perf_counter()
+            try:
+                statement = next(decoder)
+            except StopIteration as done:
+                rest = done.value
+                seconds += time.perf_counter() - started
+                break
+            seconds += time.perf_counter() - started
+            count += 1
+            yield statement
+        size = response.raw.tell()
+
+    metric = {"url": url, "status": response.status_code,
+              "wait": response.elapsed.total_seconds(), "seconds": seconds,
+              "bytes": size, "statements": count}
+    return rest, metric
+
+
+def iter_statements(session, base_url, params, since, until):
+    """Yield every statement matching ``params`` stored in ``(since, until]``."""
+    query = dict(params, since=utc_iso(since), until=utc_iso(until))
+    lrs_URL = f"{base_url}?{urlencode(query)}"
+
+    while lrs_URL:
+        more = yield from get_statements(session, lrs_URL)
+        # `more` is usually relative to the LRS host
+        lrs_URL = urljoin(base_url, more) if more else None
+
+
+def request_summary():
+    """Totals over ``REQUEST_LOG``."""
+    log = list(REQUEST_LOG)
+    return {"requests": len(log),
+            "seconds": sum(m["seconds"] for m in log),
+            "bytes": sum(m["bytes"] for m in log),
+            "statements": sum(m["statements"] for m in log)}
@@ -0,0 +1,46 @@
+"""Spotting statements the apps reported twice.
+
+Double reporting sends the same event again under a new statement id, so
+de-duplicating on ``id`` alone misses it. Statements are also compared on a
+fingerprint of who did what with which result: the actor, activity, verb,
+raw score and response. Two statements with the same fingerprint whose
+timestamps are within ``TOLERANCE`` seconds are the same event.
+
+Kept statements are indexed by fingerprint and by the ``TOLERANCE`` wide
+time bucket they fall in. Finding an earlier copy of a statement only looks
+at its own bucket and the two next to it, so checking a statement does not
+depend on how many are already stored.
+"""
+import hashlib
+import os
+
+TOLERANCE = float(os.environ.get("CL_LRS_DUPLICATE_SECONDS", 5))
+
+
+def fingerprint(statement, actor):
+    """Hash of the parts of a statement that make two reports the same event.
+
+    ``actor`` is the statement's ``lrs.store.actor_key``.
+    """
+    result = statement.get("result") or {}
+    parts = [actor,
+             statement.get("object", {}).get("id"),
+             statement.get("verb", {}).get("id"),
+             (result.get("score") or {}).get("raw"),
+             result.get("response")]
+    return hashlib.blake2b("\x1f".join(map(repr, parts)).encode("utf-8"), digest_size=16).digest()
+
+
+def bucket(seconds, tolerance=TOLERANCE):
+    """The time bucket of a timestamp given as epoch seconds."""
+    return int(seconds // tolerance)
+
+
+def find_original(candidates, seconds, tolerance=TOLERANCE):
+    """Return the id of the nearest ``(id, seconds)`` candidate within ``tolerance``, or None."""
+    best = None
+    for candidate_id, candidate_seconds in candidates:
+        gap = abs(candidate_seconds - seconds)
+        if gap <= tolerance and (best is None or gap < best[0]):
+            best = (gap, candidate_id)
+    return best and best[1]
@@ -0,0 +1,62 @@
+"""Export loaded frames as CSV, gzip CSV or Parquet files.
+
+Files are built only when someone downloads them, a chunk of rows at a
+time, and handed to Streamlit as bytes. Nothing is kept around after the
+download, unlike caching the encoded CSV next to every loaded frame.
+"""
+import io
+import zlib
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is offered only when pyarrow is installed
+    pa = None
+
+CHUNK_ROWS = 50_000
+
+
+def _csv_chunks(df, chunk_rows):
+    for start in range(0, max(len(df.index), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(header=start == 0).encode('utf-8')
+
+
+def write_csv(df, out, chunk_rows=CHUNK_ROWS):
+    """Write ``df`` to ``out`` as CSV, a chunk of rows at a time."""
+    for chunk in _csv_chunks(df, chunk_rows):
+        out.write(chunk)
+
+
+def write_csv_gzip(df, out, chunk_rows=CHUNK_ROWS):
+    """Write ``df`` to ``out`` as gzip compressed CSV."""
+    compressor = zlib.compressobj(wbits=31)  # 31 selects the gzip container
+    for chunk in _csv_chunks(df, chunk_rows):
+        out.write(compressor.compress(chunk))
+    out.write(compressor.flush())
+
+
+def write_parquet(df, out, chunk_rows=CHUNK_ROWS):
+    """Write ``df`` to ``out`` as Parquet, one row group per chunk."""
+    schema = pa.Schema.from_pandas(df)
+    with pq.ParquetWriter(out, schema) as writer:
+        for start in range(0, len(df.index), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows]
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema))
+
+
+# label: (file extension, mime type, writer)
+FORMATS = {'CSV': ('.csv', 'text/csv', write_csv),
+           'CSV (gzip)': ('.csv.gz', 'application/gzip', write_csv_gzip)}
+if pa is not None:
+    FORMATS['Parquet'] = ('.parquet', 'application/vnd.apache.parquet', write_parquet)
+
+
+def export_file(df, export_format):
+    """Return ``df`` in ``export_format`` as bytes.
+
+    ``st.download_button`` holds the whole file in memory either way, so it
+    is written to memory too.
+    """
+    out = io.BytesIO()
+    FORMATS[export_format][2](df, out)
+    return out.getvalue()
@@ -0,0 +1,24 @@
+"""Build DataFrames from statements in a single pass.
+
+Only the flattened columns a loader keeps are pulled out of each statement,
+into one list per column, and the frame is built once at the end rather
+than normalizing every page and concatenating it onto what came before.
+"""
+import pandas as pd
+
+
+def statements_frame(statements, columns):
+    """Return a frame with one row per statement and only ``columns``.
+
+    Columns are named the way ``pd.json_normalize`` names them, e.g.
+    ``actor.account.name``; a path missing from a statement gives ``None``.
+    """
+    paths = [(column.split("."), []) for column in columns]
+    for statement in statements:
+        for path, values in paths:
+            value = statement
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+            values.append(value)
+    return pd.DataFrame({column: values for column, (path, values) in zip(columns, paths)},
+                        columns=columns)
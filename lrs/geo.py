@@ -0,0 +1,71 @@
+"""Aggregate statement locations into map points.
+
+``st.map`` sends every row it is given to the browser, so a page with tens
+of thousands of located statements ships all of them. Points are instead
+binned into square grid cells sized for the map zoom, or grouped by city,
+region or country, and only one point per cell or place is sent, with its
+statement count. The payload grows with the number of cells, not
+statements.
+"""
+import numpy as np
+import pandas as pd
+
+# how points can be grouped; "grid" cells shrink as the zoom grows
+MODES = ('grid', 'city', 'region', 'country')
+PLACES = {'city': ['country', 'region', 'city'],
+          'region': ['country', 'region'],
+          'country': ['country']}
+
+# a 256 pixel map tile spans 360 / 2**zoom degrees; cut it into this many cells
+CELLS_PER_TILE = 8
+# grid cells are made coarser until there are no more points than this
+MAX_POINTS = 5000
+METERS_PER_DEGREE = 111_320
+
+
+def cell_degrees(zoom):
+    """Width in degrees of a grid cell at ``zoom``."""
+    return 360 / 2 ** zoom / CELLS_PER_TILE
+
+
+def grid_points(lat, lon, degrees):
+    """One point per ``degrees`` wide cell: the mean position of its points and their count."""
+    cells = pd.DataFrame({'lat': lat.to_numpy(dtype=float), 'lon': lon.to_numpy(dtype=float),
+                          'row': np.floor(lat.to_numpy(dtype=float) / degrees),
+                          'col': np.floor(lon.to_numpy(dtype=float) / degrees)})
+    grouped = cells.groupby(['row', 'col'], sort=False)
+    points = grouped[['lat', 'lon']].mean()
+    points['count'] = grouped.size()
+    return points.reset_index(drop=True)
+
+
+def place_points(df, mode):
+    """One point per city, region or country: the mean position of its points and their count."""
+    grouped = df.groupby(PLACES[mode], observed=True, sort=False, dropna=False)
+    points = grouped[['lat', 'lon']].mean()
+    points['count'] = grouped.size()
+    return points.reset_index()
+
+
+def map_points(df, mode='grid', zoom=3):
+    """Aggregate the located rows of ``df`` for ``st.map`` at ``zoom``.
+
+    Returns ``lat``, ``lon``, ``count`` and a ``size`` in meters that grows
+    with the count, plus the place columns when grouping by place.
+    """
+    df = df.dropna(subset=['lat', 'lon'], how='any')
+    if mode == 'grid':
+        points = grid_points(df['lat'], df['lon'], cell_degrees(zoom))
+        while len(points.index) > MAX_POINTS and zoom > 0:
+            zoom -= 1
+            points = grid_points(df['lat'], df['lon'], cell_degrees(zoom))
+    else:
+        points = place_points(df, mode)
+
+    # the biggest point is half a cell across
+    radius = cell_degrees(zoom) * METERS_PER_DEGREE / 4
+    if len(points.index) > 0:
+        points['size'] = radius * np.sqrt(points['count'] / points['count'].max()).clip(0.2)
+    else:
+        points['size'] = pd.Series(dtype=float)
+    return points
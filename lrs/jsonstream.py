@@ -0,0 +1,108 @@
+"""Incremental decoding of LRS statement result bodies.
+
+An xAPI ``StatementResult`` is ``{"statements": [...], "more": "..."}``. Rather
+than decoding the whole body into one string and one object tree, the body
+is read chunk by chunk and the statements are handed out one at a time, so
+only a single statement has to be held in memory beyond the read buffer.
+"""
+import codecs
+import json
+
+_WHITESPACE = " \t\n\r"
+# what can follow a complete number or literal
+_DELIMITERS = _WHITESPACE + ",:]}"
+_DECODER = json.JSONDecoder()
+# drop consumed text from the buffer once this much has piled up
+_COMPACT_AT = 1 << 16
+
+
+class _Reader:
+    """Text buffer over an iterator of byte chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Read another chunk into the buffer. Returns False at the end."""
+        if self.eof:
+            return False
+        if self.pos > _COMPACT_AT:
+            self.text = self.text[self.pos:]
+            self.pos = 0
+        for chunk in self.chunks:
+            if chunk:
+                self.text += self.utf8.decode(chunk)
+                return True
+        self.text += self.utf8.decode(b"", final=True)
+        self.eof = True
+        return False
+
+    def peek(self):
+        """Skip whitespace and return the next character, '' at the end."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ""
+
+    def take(self, allowed):
+        """Consume the next character, which must be one of ``allowed``."""
+        char = self.peek()
+        if not char or char not in allowed:
+            raise ValueError(f"expected one of {allowed!r} at offset {self.pos}, got {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # a bare number or literal is only complete once a delimiter
+            # follows it; raw_decode stops early on "12345." or "1e"
+            if (not isinstance(value, (dict, list, str))
+                    and (end == len(self.text) or self.text[end] not in _DELIMITERS)
+                    and self.fill()):
+                continue
+            self.pos = end
+            return value
+
+
+def iter_statements(chunks):
+    """Yield each statement in a StatementResult body given as byte chunks.
+
+    The generator's return value is a dict of the other top level keys
+    (normally just ``more``).
+    """
+    reader = _Reader(chunks)
+    rest = {}
+    reader.take("{")
+    if reader.peek() == "}":
+        return rest
+    while True:
+        key = reader.value()
+        reader.take(":")
+        if key == "statements" and reader.peek() == "[":
+            reader.take("[")
+            if reader.peek() == "]":
+                reader.take("]")
+            else:
+                while True:
+                    yield reader.value()
+                    if reader.take(",]") == "]":
+                        break
+        else:
+            rest[key] = reader.value()
+        if reader.take(",}") == "}":
+            return rest
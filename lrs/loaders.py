@@ -0,0 +1,340 @@
+"""The loaders behind the dashboard pages.
+
+Each loader takes the statement store and the LRS statements URL, syncs
+what it needs into the store and returns a cleaned frame, cached in
+``lrs.cache.shared_cache()``. Nothing here imports Streamlit, so batch jobs
+and benchmarks can call the loaders directly; the pages pass in their
+``st.secrets`` URL and cached store. Syncing, parsing and cleaning are
+timed into the current ``lrs.timing`` trace.
+"""
+import json
+from datetime import timedelta
+
+import pandas as pd
+
+from lrs import timing
+from lrs.cache import combine, shared_cache, stored_times
+from lrs.cleaning import data_clean_up
+from lrs.frames import statements_frame
+from lrs.rollups import daily_counts, daily_scores
+from lrs.schema import apply_schema
+from lrs.store import to_utc
+from lrs.sync import scope_key, sync, sync_activity, sync_many
+from lrs.timelines import attempt_counts, user_timelines
+
+ACTIVITIES = "https://data.curiouslearning.org/xAPI/activities"
+INITIALIZED = "http://adlnet.gov/expapi/verbs/initialized"
+COMPLETED = "http://adlnet.gov/expapi/verbs/completed"
+
+# what the pages offer to choose from
+ASSESSMENT_LANGUAGES = ('ukranian', 'english', 'zulu', 'hausa', 'hausaNN', 'bangla', 'french',
+                        'nigerian-english')
+ASSESSMENTS = ('letter-sound', 'pseudo-word')
+SURVEY_LANGUAGES = ('english', 'zulu', 'hausa', 'hausaNN', 'bangla', 'french')
+SURVEYS = ('nonliterate-ses', 'none')
+
+# the only statement fields kept for completed assessments
+COMPLETED_COLUMNS = ['timestamp', 'actor.name', 'actor.account.name',
+                     'result.score.raw', 'result.duration', 'verb.display.en-US',
+                     'actor.account.homePage', 'result.score.max']
+COMPLETED_RENAME = {'actor.name': "webSessionId",
+                    'actor.account.name': "clUserId",
+                    'result.score.raw': "scoreRaw",
+                    'result.duration': "duration",
+                    'verb.display.en-US': "type",
+                    'actor.account.homePage': "userSource",
+                    'result.score.max': "scoreRawMax"}
+
+# statement fields the data loaders pull out, data_clean_up turns the choices
+# into option-N columns and keeps those in the *_OPTIONS lists
+SURVEY_COLUMNS = ['timestamp', 'verb.display.en-US', 'actor.name',
+                  'actor.account.name', 'actor.account.homePage',
+                  'object.definition.description.en-US', 'object.definition.choices',
+                  'result.response', 'result.duration',
+                  'object.location.lat', 'object.location.lng',
+                  'object.location.city', 'object.location.region',
+                  'object.location.country']
+SURVEY_OPTIONS = ['option-0', 'option-1', 'option-2', 'option-3', 'option-4', 'option-5']
+ASSESSMENT_COLUMNS = ['timestamp', 'verb.display.en-US', 'actor.name',
+                      'actor.account.name', 'actor.account.homePage',
+                      'object.definition.description.en-US', 'object.definition.choices',
+                      'result.response', 'result.duration',
+                      'result.score.raw', 'result.score.max', 'object.id',
+                      'object.location.lat', 'object.location.lng',
+                      'object.location.city', 'object.location.region',
+                      'object.location.country']
+ASSESSMENT_OPTIONS = ['option-0', 'option-1', 'option-2', 'option-3']
+
+
+def activity_id(kind, lang, item):
+    """Return the activity id of an assessment or survey, e.g. ``assessment/english/letter-sound``."""
+    return f"{ACTIVITIES}/{kind}/{lang}/{item}"
+
+
+def synced_to(store, scopes):
+    """The newest watermark any of ``scopes`` is synced to, or None."""
+    coverage = [store.coverage(scope_key(params)) for params in scopes]
+    return max((to_utc(watermark) for _, watermark in filter(None, coverage)), default=None)
+
+
+def refresh_from(stale, since):
+    """Where reading the store starts, and the rows of a stale copy to keep.
+
+    A stale copy is only known to be complete up to the watermark its
+    scope was synced to when it was loaded. Rows stored after that may
+    have come in from another scope's shards while older ones were still
+    arriving, so they are dropped and read again.
+    """
+    if stale is None or stale[2] is None:
+        return since, None
+    df, stored, watermark = stale
+    keep = (stored <= watermark).to_numpy()
+    older = df[keep].reset_index(drop=True), stored[keep].reset_index(drop=True)
+    return max(to_utc(since), watermark), older
+
+
+def refresh():
+    """Have the next load of every window reaching into today add what was stored since."""
+    shared_cache().expire_live()
+
+
+def load_assessment_completed_data(store, base_url, lang, ass_type, since, until):
+    """Load completed statements for the Curious Learing LRS."""
+    params = {'activity': activity_id('assessment', lang, ass_type), 'verb': COMPLETED}
+    until = until + timedelta(days=1)
+    cache = shared_cache()
+    key = ('completed', lang, ass_type)
+    df = cache.get(key, since, until)
+    if df is not None:
+        return df
+
+    # only the statements newer than what is already stored come from the LRS
+    with timing.stage('sync'):
+        sync(store, base_url, params, since, until)
+    watermark = synced_to(store, [params])
+    # and a stale copy of this window only misses what was stored after its watermark
+    start, older = refresh_from(cache.get_stale(key, since, until), since)
+    with timing.stage('parse'):
+        df = statements_frame(store.iter_statements(start, until, **params),
+                              COMPLETED_COLUMNS + ['stored'])
+        stored = stored_times(df.pop('stored'))
+
+    if len(df.index) > 0:
+        # double reported statements were marked as duplicates as they were
+        # stored (see lrs.dedup) and are not read back
+
+        # timestamp to UTC datetime, duration to seconds, compact types
+        with timing.stage('clean'):
+            df = apply_schema(df.rename(columns=COMPLETED_RENAME))
+
+    if older is not None:
+        timing.count('rows_refreshed', len(df.index))
+        df, stored = combine((df, stored), older)
+    timing.count('rows', len(df.index))
+    cache.put(key, since, until, df, stored, watermark)
+    return df
+
+
+def _completed_params(lang, ass_type):
+    return {'activity': activity_id('assessment', lang, ass_type), 'verb': COMPLETED}
+
+
+def page_scopes():
+    """The LRS query params the loaders sync for every choice the pages offer."""
+    scopes = []
+    for kind, langs, items in (('assessment', ASSESSMENT_LANGUAGES, ASSESSMENTS),
+                               ('survey', SURVEY_LANGUAGES, SURVEYS)):
+        for lang in langs:
+            for item in items:
+                activity = activity_id(kind, lang, item)
+                scopes += [{'activity': activity, 'verb': COMPLETED},
+                           {'activity': activity, 'verb': INITIALIZED},
+                           {'activity': activity, 'related_activities': 'true'}]
+    return scopes
+
+
+def _cached_rollup(cache, lang, ass_type, since, until):
+    counts = cache.get(('daily_counts', lang, ass_type), since, until + timedelta(days=1))
+    scores = cache.get(('daily_scores', lang, ass_type), since, until + timedelta(days=1))
+    if counts is None or scores is None:
+        return None
+    return counts, scores
+
+
+def _read_rollup(store, cache, lang, ass_type, since, until):
+    """Read the daily rollups of an assessment out of the store and cache them."""
+    params = _completed_params(lang, ass_type)
+    counts = daily_counts(store, params['activity'], params['verb'], since, until)
+    scores = daily_scores(store, params['activity'], params['verb'], since, until)
+    timing.count('rows', len(counts.index) + len(scores.index))
+    cache.put(('daily_counts', lang, ass_type), since, until + timedelta(days=1), counts)
+    cache.put(('daily_scores', lang, ass_type), since, until + timedelta(days=1), scores)
+    return counts, scores
+
+
+def load_daily_rollup(store, base_url, lang, ass_type, since, until):
+    """Load daily completion counts and score counts for an assessment."""
+    cache = shared_cache()
+    cached = _cached_rollup(cache, lang, ass_type, since, until)
+    if cached is not None:
+        return cached
+
+    # the store keeps the rollups current as statements are synced in
+    with timing.stage('sync'):
+        sync(store, base_url, _completed_params(lang, ass_type), since, until + timedelta(days=1))
+    with timing.stage('rollup'):
+        return _read_rollup(store, cache, lang, ass_type, since, until)
+
+
+def load_comparison(store, base_url, langs, ass_types, since, until):
+    """Load the daily rollups of every language and assessment in ``langs`` x ``ass_types``.
+
+    Whatever is not cached is synced in a single pass over all of them (see
+    ``lrs.sync.sync_many``). Returns counts and scores frames like
+    ``load_daily_rollup``'s, with ``language`` and ``assessment`` columns.
+    """
+    cache = shared_cache()
+    pairs = [(lang, ass_type) for lang in langs for ass_type in ass_types]
+    rollups = {pair: _cached_rollup(cache, *pair, since, until) for pair in pairs}
+    missing = [pair for pair, rollup in rollups.items() if rollup is None]
+
+    if missing:
+        with timing.stage('sync'):
+            sync_many(store, base_url, [_completed_params(*pair) for pair in missing],
+                      since, until + timedelta(days=1))
+        with timing.stage('rollup'):
+            for pair in missing:
+                rollups[pair] = _read_rollup(store, cache, *pair, since, until)
+
+    frames = []
+    for (lang, ass_type), (counts, scores) in rollups.items():
+        frames.append((counts.assign(language=lang, assessment=ass_type),
+                       scores.assign(language=lang, assessment=ass_type)))
+    if not frames:
+        return (pd.DataFrame(columns=['day', 'userSource', 'count', 'language', 'assessment']),
+                pd.DataFrame(columns=['day', 'scoreRaw', 'scoreRawMax', 'count',
+                                      'language', 'assessment']))
+    counts, scores = zip(*frames)
+    return pd.concat(counts, ignore_index=True), pd.concat(scores, ignore_index=True)
+
+
+def load_attempt_counts(store, base_url, lang, ass_type, since, until, user_prefix=None):
+    """Load how many users made each number of attempts at an assessment.
+
+    Syncs the assessment's completions, so the store's timelines are
+    current for ``lrs.timelines.user_timelines`` too.
+    """
+    cache = shared_cache()
+    key = ('attempt_counts', lang, ass_type, user_prefix or None)
+    counts = cache.get(key, since, until + timedelta(days=1))
+    if counts is not None:
+        return counts
+
+    with timing.stage('sync'):
+        sync(store, base_url, _completed_params(lang, ass_type), since, until + timedelta(days=1))
+    with timing.stage('timelines'):
+        counts = attempt_counts(store, activity_id('assessment', lang, ass_type),
+                                since, until + timedelta(days=1), user_prefix)
+    cache.put(key, since, until + timedelta(days=1), counts)
+    return counts
+
+
+def load_user_timelines(store, lang, ass_type, since, until, user_prefix=None,
+                        order_by='attempts', ascending=False, number=0):
+    """Load page ``number`` of the users' timelines on an assessment, as synced by ``load_attempt_counts``."""
+    with timing.stage('timelines'):
+        return user_timelines(store, activity_id('assessment', lang, ass_type),
+                              since, until + timedelta(days=1), user_prefix, order_by,
+                              ascending, number)
+
+
+def load_actor_set(store, base_url, activity, since, until):
+    """Return the actors, as JSON, that initialized ``activity``."""
+    with timing.stage('sync'):
+        sync(store, base_url, {'activity': activity, 'verb': INITIALIZED}, since, until)
+    return {json.dumps(actor) for actor in store.actors(activity, since, until, verb=INITIALIZED)}
+
+
+def load_actor_data(store, base_url, activity, since, until, columns, options):
+    """Load all data for ``activity`` from the actors that initialized it."""
+    cache = shared_cache()
+    # which actors are included depends on the whole range, so only the
+    # exact same range can be reused
+    key = ('actors', activity)
+    df = cache.get(key, since, until)
+    if df is not None:
+        return df
+
+    df = pd.DataFrame()
+
+    # one query for the activity brings in both the initialized statements
+    # and everything else the actors did on it, the rest is answered locally
+    with timing.stage('sync'):
+        sync_activity(store, base_url, activity, since, until)
+    with timing.stage('parse'):
+        actors = store.actors(activity, since, until, verb=INITIALIZED)
+        if len(actors) > 0:
+            # keep only those statements for this activity
+            statements = store.iter_statements(since, until, activity=activity, related=True,
+                                               actors=actors)
+            df = statements_frame(statements, columns)
+
+    with timing.stage('clean'):
+        df = data_clean_up(df, options)
+    timing.count('rows', len(df.index))
+    cache.put(key, since, until, df)
+    return df
+
+
+def load_activity_data(store, base_url, activity, since, until, columns, options):
+    """Load all statment over time periods and filter out what you need."""
+    cache = shared_cache()
+    key = ('activity', activity)
+    df = cache.get(key, since, until)
+    if df is not None:
+        return df
+
+    with timing.stage('sync'):
+        sync_activity(store, base_url, activity, since, until)
+    # either query, the filtered one or the scan it falls back to, fills the store
+    watermark = synced_to(store, [{'activity': activity, 'related_activities': 'true'}, {}])
+    # a stale copy of this window only misses what was stored after its watermark
+    start, older = refresh_from(cache.get_stale(key, since, until), since)
+    with timing.stage('parse'):
+        # keep only those statement for this activity
+        statements = store.iter_statements(start, until, activity=activity, related=True)
+        df = statements_frame(statements, columns + ['stored'])
+        stored = stored_times(df.pop('stored'))
+
+    with timing.stage('clean'):
+        df = data_clean_up(df, options)
+    if older is not None:
+        timing.count('rows_refreshed', len(df.index))
+        df, stored = combine((df, stored), older)
+    timing.count('rows', len(df.index))
+    cache.put(key, since, until, df, stored, watermark)
+    return df
+
+
+def load_assessment_data(store, base_url, lang, ass_type, since, until):
+    """Load all data for actors that have initialized the assessment."""
+    return load_actor_data(store, base_url, activity_id('assessment', lang, ass_type),
+                           since, until, ASSESSMENT_COLUMNS, ASSESSMENT_OPTIONS)
+
+
+def load_assessment_data_alt(store, base_url, lang, ass_type, since, until):
+    """Load every statement of the assessment, filtered by the LRS."""
+    return load_activity_data(store, base_url, activity_id('assessment', lang, ass_type),
+                              since, until, ASSESSMENT_COLUMNS, ASSESSMENT_OPTIONS)
+
+
+def load_survey_data(store, base_url, lang, ass_type, since, until):
+    """Load all data for actors that have initialized the survey, through ``until``."""
+    return load_actor_data(store, base_url, activity_id('survey', lang, ass_type),
+                           since, until + timedelta(days=1), SURVEY_COLUMNS, SURVEY_OPTIONS)
+
+
+def load_survey_data_alt(store, base_url, lang, ass_type, since, until):
+    """Load every statement of the survey through ``until``, filtered by the LRS."""
+    return load_activity_data(store, base_url, activity_id('survey', lang, ass_type),
+                              since, until + timedelta(days=1), SURVEY_COLUMNS, SURVEY_OPTIONS)
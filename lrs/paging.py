@@ -0,0 +1,54 @@
+"""Filter, sort and page a loaded frame without copying it.
+
+Showing a raw-data frame sends every row to the browser. Instead the rows
+that pass the filters are found as positions, sorted on one column, and
+only the rows of the page being looked at are taken out of the frame.
+"""
+import numpy as np
+import pandas as pd
+
+PAGE_SIZE = 100
+# columns the raw-data views can filter on
+FILTER_COLUMNS = ('type', 'userSource', 'country', 'clUserId')
+
+
+def view(df, filters=None, sort_by=None, ascending=True):
+    """Return the positions of the rows of ``df`` that pass ``filters``, in order.
+
+    ``filters`` maps a column to a list of values to keep, or to a string
+    the values have to start with. Empty filters keep everything. Rows are
+    sorted on ``sort_by`` if given, missing values last.
+    """
+    keep = np.ones(len(df.index), dtype=bool)
+    for column, wanted in (filters or {}).items():
+        if not wanted or column not in df.columns:
+            continue
+        if isinstance(wanted, str):
+            matches = df[column].astype("string").str.startswith(wanted)
+        else:
+            matches = df[column].isin(wanted)
+        keep &= matches.fillna(False).to_numpy(dtype=bool)
+    positions = np.flatnonzero(keep)
+
+    if sort_by is not None:
+        values = df[sort_by].take(positions).reset_index(drop=True)
+        order = values.sort_values(ascending=ascending, kind="stable", na_position="last").index
+        positions = positions[order.to_numpy()]
+    return positions
+
+
+def page_count(positions, size=PAGE_SIZE):
+    """How many pages ``positions`` fill, at least one."""
+    return max(1, -(-len(positions) // size))
+
+
+def page(df, positions, number, size=PAGE_SIZE):
+    """Return the rows of page ``number``, counting from 0."""
+    return df.iloc[positions[number * size:(number + 1) * size]]
+
+
+def filter_options(values):
+    """The values a column can be filtered to, sorted."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return list(values.cat.categories)
+    return sorted(values.dropna().unique())
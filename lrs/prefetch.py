@@ -0,0 +1,149 @@
+"""Warm the loaders' default views in the background.
+
+The pages open on the last 30 days, and what can be chosen there is fixed
+(see ``lrs.loaders``), so every language/assessment and language/survey
+view a user can open first is loaded ahead of them on startup. Every
+``INTERVAL`` seconds the cached windows reaching into the current day are
+expired and loaded again; the sync only fetches what arrived since the last
+run, and only those rows are added to the cached frames. Prefetching runs
+``WORKERS`` jobs at a time and its requests count against the same
+``lrs.client.MAX_IN_FLIGHT`` budget as everything else.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from queue import Empty, Queue
+
+from lrs import loaders
+from lrs.cache import LIVE_TTL, shared_cache
+
+logger = logging.getLogger(__name__)
+
+# set CL_LRS_PREFETCH=0 to turn prefetching off
+ENABLED = os.environ.get("CL_LRS_PREFETCH", "1") != "0"
+# how many views are loaded at the same time
+WORKERS = int(os.environ.get("CL_LRS_PREFETCH_WORKERS", 2))
+# seconds between refreshes of the current day
+INTERVAL = int(os.environ.get("CL_LRS_PREFETCH_INTERVAL", LIVE_TTL))
+# the window the pages open on
+DAYS = 30
+
+
+def default_jobs(today=None):
+    """Return ``(name, loader, args)`` for each page's default view."""
+    today = today or date.today()
+    since = today - timedelta(days=DAYS)
+    jobs = []
+    for lang in loaders.ASSESSMENT_LANGUAGES:
+        for item in loaders.ASSESSMENTS:
+            jobs.append((f"scores/{lang}/{item}", loaders.load_daily_rollup,
+                         (lang, item, since, today)))
+            jobs.append((f"assessment/{lang}/{item}", loaders.load_assessment_data_alt,
+                         (lang, item, since, today + timedelta(days=1))))
+    for lang in loaders.SURVEY_LANGUAGES:
+        for item in loaders.SURVEYS:
+            jobs.append((f"survey/{lang}/{item}", loaders.load_survey_data,
+                         (lang, item, since, today)))
+    return jobs
+
+
+class Prefetcher:
+    """Loads ``jobs()`` on start and again every ``interval`` seconds."""
+
+    def __init__(self, store, base_url, jobs=default_jobs, workers=WORKERS, interval=INTERVAL):
+        self.store = store
+        self.base_url = base_url
+        self.jobs = jobs
+        self.workers = workers
+        self.interval = interval
+        self._status = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start warming on a background thread."""
+        if self._thread is None:
+            # no new jobs once the interpreter is exiting
+            atexit.register(self.stop)
+            self._thread = threading.Thread(target=self._loop, name="lrs-prefetch", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop after the jobs that are running now."""
+        self._stop.set()
+
+    def run_once(self):
+        """Load every job, ``workers`` at a time."""
+        jobs = self.jobs()
+        with self._lock:
+            for name, _, _ in jobs:
+                self._status.setdefault(name, {"state": "pending", "loaded": None,
+                                               "seconds": None, "error": None})
+        queue = Queue()
+        for job in jobs:
+            queue.put(job)
+        # daemon threads, so a job in progress does not hold up shutting down
+        threads = [threading.Thread(target=self._work, args=(queue,), daemon=True,
+                                    name=f"lrs-prefetch-{i}") for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def status(self):
+        """Return the state of every job by name: pending, warming, warm or failed."""
+        with self._lock:
+            return {name: dict(status) for name, status in self._status.items()}
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.run_once()
+            if self._stop.wait(self.interval):
+                break
+            # reload the windows that reach into today
+            shared_cache().expire_live()
+
+    def _work(self, queue):
+        while not self._stop.is_set():
+            try:
+                job = queue.get_nowait()
+            except Empty:
+                return
+            self._run(*job)
+
+    def _run(self, name, loader, args):
+        self._set(name, state="warming")
+        started = time.perf_counter()
+        try:
+            loader(self.store, self.base_url, *args)
+        except Exception as error:
+            if self._stop.is_set():
+                return
+            logger.exception("prefetching %s failed", name)
+            self._set(name, state="failed", error=repr(error))
+            return
+        self._set(name, state="warm", loaded=datetime.now(timezone.utc),
+                  seconds=time.perf_counter() - started, error=None)
+
+    def _set(self, name, **status):
+        with self._lock:
+            self._status[name].update(status)
+
+
+_shared_prefetcher = None
+_shared_lock = threading.Lock()
+
+
+def shared_prefetcher(store, base_url):
+    """Return the process wide prefetcher, started on first use unless disabled."""
+    global _shared_prefetcher
+    with _shared_lock:
+        if _shared_prefetcher is None:
+            _shared_prefetcher = Prefetcher(store, base_url)
+            if ENABLED:
+                _shared_prefetcher.start()
+        return _shared_prefetcher
@@ -0,0 +1,32 @@
+"""Daily rollups of stored statements as DataFrames.
+
+The store keeps these up to date as statements arrive (see
+``lrs.store``), so a page can chart counts and score distributions from a
+few hundred rows instead of loading every statement in the range.
+"""
+import numpy as np
+import pandas as pd
+
+
+def daily_counts(store, activity, verb, since, until):
+    """Statement counts per day and user source for days in ``[since, until]``."""
+    df = pd.DataFrame(store.daily_counts(activity, verb, since, until),
+                      columns=['day', 'userSource', 'count'])
+    df['day'] = pd.to_datetime(df['day']).dt.date
+    df['userSource'] = df['userSource'].replace('', None)
+    return df
+
+
+def daily_scores(store, activity, verb, since, until):
+    """Statement counts per day and raw score for days in ``[since, until]``."""
+    df = pd.DataFrame(store.daily_scores(activity, verb, since, until),
+                      columns=['day', 'scoreRaw', 'scoreRawMax', 'count'])
+    df['day'] = pd.to_datetime(df['day']).dt.date
+    return df
+
+
+def score_histogram(scores, bins, value_range):
+    """``np.histogram`` of the scores counted in a ``daily_scores`` frame."""
+    counts, edges = np.histogram(scores['scoreRaw'], bins=bins, range=value_range,
+                                 weights=scores['count'])
+    return counts.astype(int), edges
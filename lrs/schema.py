@@ -0,0 +1,71 @@
+"""Canonical column types for cleaned statement frames.
+
+Loader results are cached once per language/assessment/date range, so they
+are stored compactly: repeated strings as categoricals, ISO 8601 durations
+as float seconds, timestamps as UTC datetimes and scores as nullable ints.
+"""
+import pandas as pd
+
+CATEGORY = "category"
+SECONDS = "seconds"
+UTC_DATETIME = "utc_datetime"
+NULLABLE_INT = "nullable_int"
+FLOAT = "float"
+
+SCHEMA = {'timestamp': UTC_DATETIME,
+          'type': CATEGORY,
+          'userSource': CATEGORY,
+          'country': CATEGORY,
+          'region': CATEGORY,
+          'city': CATEGORY,
+          'question': CATEGORY,
+          'itemURL': CATEGORY,
+          'duration': SECONDS,
+          'responseTime': SECONDS,
+          'scoreRaw': NULLABLE_INT,
+          'scoreRawMax': NULLABLE_INT,
+          'lat': FLOAT,
+          'lon': FLOAT}
+
+# answer choices, option-0 ... option-N, repeat for every answer too
+OPTION_PREFIX = "option-"
+
+_DURATION = (r"^P(?:(?P<days>\d+(?:\.\d+)?)D)?"
+             r"(?:T(?:(?P<hours>\d+(?:\.\d+)?)H)?(?:(?P<minutes>\d+(?:\.\d+)?)M)?"
+             r"(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?$")
+_DURATION_SECONDS = {'days': 86400, 'hours': 3600, 'minutes': 60, 'seconds': 1}
+
+
+def duration_seconds(values):
+    """Convert ISO 8601 durations such as ``PT12.5S`` to float seconds."""
+    parts = values.astype("string").str.extract(_DURATION).astype(float)
+    seconds = sum(parts[unit].fillna(0) * factor for unit, factor in _DURATION_SECONDS.items())
+    return seconds.where(parts.notna().any(axis=1))
+
+
+def to_nullable_int(values):
+    """Convert to ``Int64``, or ``Float64`` if some values are fractional."""
+    numbers = pd.to_numeric(values, errors="coerce").astype("Float64")
+    if (numbers.dropna() % 1 == 0).all():
+        return numbers.astype("Int64")
+    return numbers
+
+
+def apply_schema(df):
+    """Return ``df`` with every column named in ``SCHEMA`` converted."""
+    df = df.copy()
+    for column in df.columns:
+        kind = SCHEMA.get(column)
+        if kind is None and column.startswith(OPTION_PREFIX):
+            kind = CATEGORY
+        if kind == CATEGORY:
+            df[column] = df[column].astype("category")
+        elif kind == SECONDS and not pd.api.types.is_numeric_dtype(df[column]):
+            df[column] = duration_seconds(df[column])
+        elif kind == UTC_DATETIME:
+            df[column] = pd.to_datetime(df[column], utc=True, format="ISO8601")
+        elif kind == NULLABLE_INT:
+            df[column] = to_nullable_int(df[column])
+        elif kind == FLOAT:
+            df[column] = pd.to_numeric(df[column], errors="coerce")
+    return df
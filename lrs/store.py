@@ -0,0 +1,460 @@
+"""On-disk statement store for the Curious Learning LRS.
+
+Statements are kept in a SQLite file keyed on the statement ``id`` with the
+activity, verb, actor and ``stored`` time pulled out into indexed columns, so
+a date range for one activity can be read back without going to the LRS.
+Every LRS query that has been synced (a "scope") remembers the window of
+``stored`` time it covers, which is what lets a sync fetch only the delta.
+A backfill (``lrs.backfill``) checkpoints each shard it has fetched until the
+whole range is in.
+
+A statement reported twice under a new id (see ``lrs.dedup``) is stored with
+``duplicate_of`` set to the statement it repeats, and is left out of reads
+and rollups. Kept statements are indexed by fingerprint as they are added,
+so this works the same whatever order pages and shards arrive in.
+
+Triggers keep daily rollups up to date as statements are inserted: a count
+per activity, verb, day and user source, and a count per score. Days are
+the UTC date of the statement ``timestamp``. Another trigger keeps the
+agent of each actor, so the actors on an activity can be read back as the
+LRS knows them. A last one keeps a timeline per actor and activity of their
+scored completions: the first and last attempt, how many there were, and
+the first, last and best score.
+"""
+import heapq
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime, time, timezone
+
+from lrs.dedup import bucket, find_original, fingerprint
+
+DEFAULT_PATH = os.environ.get("CL_LRS_STORE",
+                              os.path.join("data", "lrs_store.sqlite3"))
+
+# sqlite's limit on bound variables is 999 on older builds
+_MAX_VARS = 500
+
+_TABLES = """
+CREATE TABLE IF NOT EXISTS statements (
+    id TEXT PRIMARY KEY,
+    stored TEXT NOT NULL,
+    timestamp TEXT,
+    activity TEXT,
+    verb TEXT,
+    actor TEXT,
+    statement TEXT NOT NULL,
+    duplicate_of TEXT
+);
+CREATE INDEX IF NOT EXISTS statements_activity_stored ON statements (activity, stored);
+CREATE INDEX IF NOT EXISTS statements_stored ON statements (stored);
+CREATE INDEX IF NOT EXISTS statements_actor ON statements (actor);
+CREATE TABLE IF NOT EXISTS fingerprints (
+    fingerprint BLOB NOT NULL,
+    bucket INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fingerprints_bucket ON fingerprints (fingerprint, bucket);
+CREATE TABLE IF NOT EXISTS sync_state (
+    scope TEXT PRIMARY KEY,
+    since TEXT NOT NULL,
+    watermark TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS backfill_shards (
+    scope TEXT NOT NULL,
+    since TEXT NOT NULL,
+    until TEXT NOT NULL,
+    statements INTEGER NOT NULL,
+    PRIMARY KEY (scope, since, until)
+);
+CREATE TABLE IF NOT EXISTS daily_counts (
+    activity TEXT NOT NULL,
+    verb TEXT NOT NULL,
+    day TEXT NOT NULL,
+    user_source TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (activity, verb, day, user_source)
+);
+CREATE TABLE IF NOT EXISTS daily_scores (
+    activity TEXT NOT NULL,
+    verb TEXT NOT NULL,
+    day TEXT NOT NULL,
+    score REAL NOT NULL,
+    score_max REAL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (activity, verb, day, score)
+);
+CREATE TABLE IF NOT EXISTS actors (
+    actor TEXT PRIMARY KEY,
+    agent TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS user_timelines (
+    actor TEXT NOT NULL,
+    activity TEXT NOT NULL,
+    user TEXT,
+    first_at TEXT NOT NULL,
+    last_at TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    first_score REAL NOT NULL,
+    last_score REAL NOT NULL,
+    best_score REAL NOT NULL,
+    score_max REAL,
+    PRIMARY KEY (actor, activity)
+);
+CREATE INDEX IF NOT EXISTS user_timelines_activity_user ON user_timelines (activity, user);
+CREATE INDEX IF NOT EXISTS user_timelines_activity_attempts ON user_timelines (activity, attempts);
+CREATE INDEX IF NOT EXISTS user_timelines_activity_improvement ON user_timelines
+    (activity, last_score - first_score);
+CREATE INDEX IF NOT EXISTS user_timelines_activity_best ON user_timelines (activity, best_score);
+CREATE INDEX IF NOT EXISTS user_timelines_activity_last ON user_timelines (activity, last_at);
+CREATE INDEX IF NOT EXISTS user_timelines_activity_first ON user_timelines (activity, first_at);
+"""
+
+_ROLLUP_KEY = """IFNULL(NEW.activity, ''), IFNULL(NEW.verb, ''),
+    substr(IFNULL(NEW.timestamp, NEW.stored), 1, 10)"""
+_USER_SOURCE = "IFNULL(json_extract(NEW.statement, '$.actor.account.homePage'), '')"
+_SCORE = "json_extract(NEW.statement, '$.result.score.raw')"
+_SCORE_MAX = "json_extract(NEW.statement, '$.result.score.max')"
+
+_ROLLUP_TRIGGER = f"""
+CREATE TRIGGER IF NOT EXISTS statements_rollup AFTER INSERT ON statements
+WHEN NEW.duplicate_of IS NULL
+BEGIN
+    INSERT INTO daily_counts VALUES ({_ROLLUP_KEY}, {_USER_SOURCE}, 1)
+    ON CONFLICT (activity, verb, day, user_source) DO UPDATE SET count = count + 1;
+    INSERT INTO daily_scores SELECT {_ROLLUP_KEY}, {_SCORE}, {_SCORE_MAX}, 1
+    WHERE {_SCORE} IS NOT NULL
+    ON CONFLICT (activity, verb, day, score) DO UPDATE SET count = count + 1,
+        score_max = IFNULL(excluded.score_max, score_max);
+END;
+"""
+
+# the agent the LRS first sent for each actor, to query it by
+_ACTOR_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS statements_actors AFTER INSERT ON statements
+WHEN NEW.duplicate_of IS NULL
+BEGIN
+    INSERT OR IGNORE INTO actors VALUES (NEW.actor, json_extract(NEW.statement, '$.actor'));
+END;
+"""
+
+# a scored completion is one attempt at an assessment, made at its timestamp
+_COMPLETED = "http://adlnet.gov/expapi/verbs/completed"
+_SEEN = "IFNULL(NEW.timestamp, NEW.stored)"
+_USER = "json_extract(NEW.statement, '$.actor.account.name')"
+
+# statements can arrive in any order, so the first and last scores follow
+# the attempt times rather than the order they were added in
+_TIMELINE_TRIGGER = f"""
+CREATE TRIGGER IF NOT EXISTS statements_timelines AFTER INSERT ON statements
+WHEN NEW.duplicate_of IS NULL AND NEW.verb = '{_COMPLETED}' AND {_SCORE} IS NOT NULL
+BEGIN
+    INSERT INTO user_timelines VALUES (NEW.actor, IFNULL(NEW.activity, ''), {_USER},
+                                       {_SEEN}, {_SEEN}, 1, {_SCORE}, {_SCORE}, {_SCORE},
+                                       {_SCORE_MAX})
+    ON CONFLICT (actor, activity) DO UPDATE SET attempts = attempts + 1,
+        first_score = CASE WHEN excluded.first_at < first_at
+                      THEN excluded.first_score ELSE first_score END,
+        last_score = CASE WHEN excluded.last_at >= last_at
+                     THEN excluded.last_score ELSE last_score END,
+        first_at = min(first_at, excluded.first_at),
+        last_at = max(last_at, excluded.last_at),
+        best_score = max(best_score, excluded.best_score),
+        score_max = IFNULL(excluded.score_max, score_max);
+END;
+"""
+
+_SCHEMA = _TABLES + _ROLLUP_TRIGGER + _ACTOR_TRIGGER + _TIMELINE_TRIGGER
+
+
+def to_utc(value):
+    """Turn a date, datetime or ISO 8601 string into an aware UTC datetime."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    elif not isinstance(value, datetime):
+        value = datetime.combine(value, time.min)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def utc_iso(value):
+    """Format a time as a fixed width UTC string that sorts correctly."""
+    return to_utc(value).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _day(value):
+    return utc_iso(value)[:10]
+
+
+def actor_key(actor):
+    """Return the inverse functional identifier of an xAPI actor."""
+    account = actor.get("account")
+    if account:
+        return f"account:{account.get('homePage')}|{account.get('name')}"
+    for ifi in ("mbox", "mbox_sha1sum", "openid"):
+        if ifi in actor:
+            return f"{ifi}:{actor[ifi]}"
+    return json.dumps(actor, sort_keys=True)
+
+
+# what ``StatementStore.user_timelines`` can sort on
+TIMELINE_ORDERS = {"attempts": "attempts",
+                   "improvement": "last_score - first_score",
+                   "best_score": "best_score",
+                   "last_attempt": "last_at",
+                   "first_attempt": "first_at",
+                   "user": "user"}
+
+
+def _timeline_filter(activity, since, until, user_prefix):
+    # the unary + keeps sqlite from scanning on the date range rather than
+    # on the index of the order asked for
+    where = "activity = ? AND +first_at <= ? AND +last_at > ?"
+    args = [activity, utc_iso(until), utc_iso(since)]
+    if user_prefix:
+        where += " AND user >= ? AND user < ?"
+        args += [user_prefix, user_prefix + "\uffff"]
+    return where, args
+
+
+def _resolve(con, entries):
+    """Return ``duplicate_of`` for each ``(id, fingerprint, seconds)`` in ``entries``.
+
+    Entries are checked in order against the kept statements, earlier
+    entries included; the ones that are kept are added to ``fingerprints``.
+    """
+    buckets = [bucket(seconds) for _, _, seconds in entries]
+    keys = sorted({key for _, key, _ in entries})
+    kept = {}
+    for i in range(0, len(keys), _MAX_VARS):
+        chunk = keys[i:i + _MAX_VARS]
+        rows = con.execute("SELECT fingerprint, bucket, id, seconds FROM fingerprints "
+                           f"WHERE fingerprint IN ({','.join('?' * len(chunk))}) "
+                           "AND bucket BETWEEN ? AND ?",
+                           chunk + [min(buckets, default=0) - 1, max(buckets, default=0) + 1])
+        for key, b, id_, seconds in rows:
+            kept.setdefault((key, b), []).append((id_, seconds))
+
+    originals = []
+    new = []
+    for (id_, key, seconds), b in zip(entries, buckets):
+        near = (c for n in (b - 1, b, b + 1) for c in kept.get((key, n), ()))
+        original = find_original(near, seconds)
+        if original is None:
+            kept.setdefault((key, b), []).append((id_, seconds))
+            new.append((key, b, seconds, id_))
+        originals.append(original)
+    con.executemany("INSERT INTO fingerprints VALUES (?, ?, ?, ?)", new)
+    return originals
+
+
+class StatementStore:
+    """SQLite backed store of raw xAPI statements."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(_SCHEMA)
+
+    def _connect(self):
+        # one connection per call keeps the store safe to share between the
+        # threads streamlit runs sessions on
+        return sqlite3.connect(self.path, timeout=30)
+
+    def add(self, statements):
+        """Insert statements, ignoring ids already stored. Returns new rows.
+
+        New rows include statements stored as duplicates of one already kept.
+        """
+        rows = []
+        entries = []
+        for s in statements:
+            actor = actor_key(s.get("actor", {}))
+            timestamp = utc_iso(s["timestamp"]) if s.get("timestamp") else None
+            stored = utc_iso(s["stored"])
+            rows.append((s["id"], stored, timestamp,
+                         s.get("object", {}).get("id"),
+                         s.get("verb", {}).get("id"),
+                         actor,
+                         json.dumps(s)))
+            entries.append((s["id"], fingerprint(s, actor), to_utc(timestamp or stored).timestamp()))
+
+        with closing(self._connect()) as con, con:
+            # one writer at a time, so two copies of an event arriving in
+            # different shards can't both be kept
+            con.execute("BEGIN IMMEDIATE")
+            # a statement already stored finds itself, so only new ones are
+            # added to the fingerprints
+            originals = _resolve(con, entries)
+            cursor = con.executemany("INSERT OR IGNORE INTO statements "
+                                     "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                     [row + (original,) for row, original in zip(rows, originals)])
+            # rowcount leaves out the rollup rows the trigger writes
+            added = cursor.rowcount
+        return added
+
+    def iter_statements(self, since, until, activity=None, related=False,
+                        verb=None, actors=None, duplicates=False):
+        """Yield stored statements with ``since < stored <= until``, newest first.
+
+        ``activity`` matches the object id exactly, or as a prefix when
+        ``related`` is set. ``actors`` is an iterable of actor dicts.
+        Duplicates are only included when ``duplicates`` is set.
+        """
+        where = ["stored > ?", "stored <= ?"]
+        args = [utc_iso(since), utc_iso(until)]
+        if not duplicates:
+            where.append("duplicate_of IS NULL")
+        if activity is not None:
+            if related:
+                where.append("activity >= ? AND activity < ?")
+                args += [activity, activity + "\uffff"]
+            else:
+                where.append("activity = ?")
+                args.append(activity)
+        if verb is not None:
+            where.append("verb = ?")
+            args.append(verb)
+
+        if actors is None:
+            chunks = [None]
+        else:
+            keys = sorted({actor_key(a) for a in actors})
+            chunks = [keys[i:i + _MAX_VARS] for i in range(0, len(keys), _MAX_VARS)]
+
+        with closing(self._connect()) as con:
+            cursors = []
+            for chunk in chunks:
+                sql = "SELECT stored, statement FROM statements WHERE " + " AND ".join(where)
+                chunk_args = list(args)
+                if chunk is not None:
+                    sql += f" AND actor IN ({','.join('?' * len(chunk))})"
+                    chunk_args += chunk
+                cursors.append(con.execute(sql + " ORDER BY stored DESC", chunk_args))
+            # newest first, the same order the LRS pages them in
+            for row in heapq.merge(*cursors, key=lambda r: r[0], reverse=True):
+                yield json.loads(row[1])
+
+    def statements(self, since, until, **filters):
+        """Return ``iter_statements`` as a list."""
+        return list(self.iter_statements(since, until, **filters))
+
+    def actors(self, activity, since, until, verb=None):
+        """Return the actor dicts with statements on ``activity`` stored in ``(since, until]``."""
+        where = "activity = ? AND stored > ? AND stored <= ? AND duplicate_of IS NULL"
+        args = [activity, utc_iso(since), utc_iso(until)]
+        if verb is not None:
+            where += " AND verb = ?"
+            args.append(verb)
+        with closing(self._connect()) as con:
+            rows = con.execute("SELECT agent FROM actors WHERE actor IN "
+                               f"(SELECT actor FROM statements WHERE {where})", args).fetchall()
+        return [json.loads(agent) for agent, in rows]
+
+    def daily_counts(self, activity, verb, since, until):
+        """Return ``(day, user_source, count)`` rows for days in ``[since, until]``."""
+        with closing(self._connect()) as con:
+            return con.execute("SELECT day, user_source, count FROM daily_counts "
+                               "WHERE activity = ? AND verb = ? AND day BETWEEN ? AND ? "
+                               "ORDER BY day", (activity, verb, _day(since), _day(until))).fetchall()
+
+    def daily_scores(self, activity, verb, since, until):
+        """Return ``(day, score, score_max, count)`` rows for days in ``[since, until]``."""
+        with closing(self._connect()) as con:
+            return con.execute("SELECT day, score, score_max, count FROM daily_scores "
+                               "WHERE activity = ? AND verb = ? AND day BETWEEN ? AND ? "
+                               "ORDER BY day, score", (activity, verb, _day(since), _day(until))).fetchall()
+
+    def timeline_counts(self, activity, since, until, user_prefix=None):
+        """Return ``(attempts, users, improvement)`` rows over the timelines on ``activity``.
+
+        Timelines are counted when their attempts span reaches into
+        ``(since, until]``; ``improvement`` is the mean of last minus first
+        score of the users with that many attempts.
+        """
+        where, args = _timeline_filter(activity, since, until, user_prefix)
+        with closing(self._connect()) as con:
+            return con.execute("SELECT attempts, COUNT(*), AVG(last_score - first_score) "
+                               f"FROM user_timelines WHERE {where} "
+                               "GROUP BY attempts ORDER BY attempts", args).fetchall()
+
+    def user_timelines(self, activity, since, until, user_prefix=None, order_by="attempts",
+                       descending=True, limit=100, offset=0):
+        """Return a page of the timelines on ``activity``, filtered as in ``timeline_counts``.
+
+        Rows are ``(actor, user, first_at, last_at, attempts, first_score,
+        last_score, best_score, score_max)``, sorted on one of ``TIMELINE_ORDERS``.
+        """
+        where, args = _timeline_filter(activity, since, until, user_prefix)
+        direction = 'DESC' if descending else 'ASC'
+        # ties in rowid order, the order the index keeps them in
+        order = f"{TIMELINE_ORDERS[order_by]} {direction}, rowid {direction}"
+        with closing(self._connect()) as con:
+            return con.execute("SELECT actor, user, first_at, last_at, attempts, first_score, "
+                               "last_score, best_score, score_max FROM user_timelines "
+                               f"WHERE {where} ORDER BY {order} LIMIT ? OFFSET ?",
+                               args + [limit, offset]).fetchall()
+
+    def attempts(self, actor, activity):
+        """Return ``(at, score, score_max)`` for each attempt at ``activity``, oldest first.
+
+        ``actor`` is an ``actor_key``, as in the rows of ``user_timelines``.
+        """
+        with closing(self._connect()) as con:
+            return con.execute("SELECT IFNULL(timestamp, stored), "
+                               "json_extract(statement, '$.result.score.raw'), "
+                               "json_extract(statement, '$.result.score.max') FROM statements "
+                               "WHERE actor = ? AND activity = ? AND verb = ? "
+                               "AND duplicate_of IS NULL "
+                               "AND json_extract(statement, '$.result.score.raw') IS NOT NULL "
+                               "ORDER BY 1", (actor, activity, _COMPLETED)).fetchall()
+
+    def coverage(self, scope):
+        """Return the ``(since, watermark)`` already synced for a scope."""
+        with closing(self._connect()) as con:
+            row = con.execute("SELECT since, watermark FROM sync_state WHERE scope = ?",
+                              (scope,)).fetchone()
+        return row
+
+    def extend_coverage(self, scope, since, watermark):
+        """Record that a scope is also complete between ``since`` and ``watermark``.
+
+        The window is joined to what the scope already covers when the two
+        overlap; otherwise the one reaching later is kept.
+        """
+        with closing(self._connect()) as con, con:
+            con.execute("BEGIN IMMEDIATE")
+            row = con.execute("SELECT since, watermark FROM sync_state WHERE scope = ?",
+                              (scope,)).fetchone()
+            since, watermark = utc_iso(since), utc_iso(watermark)
+            if row is not None and row[0] <= watermark and since <= row[1]:
+                since, watermark = min(since, row[0]), max(watermark, row[1])
+            elif row is not None and row[1] > watermark:
+                return
+            con.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)",
+                        (scope, since, watermark))
+
+    def backfilled(self, scope):
+        """Return the ``(since, until)`` shards of a backfill of ``scope`` already fetched."""
+        with closing(self._connect()) as con:
+            rows = con.execute("SELECT since, until FROM backfill_shards WHERE scope = ?",
+                               (scope,)).fetchall()
+        return {(to_utc(since), to_utc(until)) for since, until in rows}
+
+    def mark_backfilled(self, scope, since, until, statements):
+        """Checkpoint a fetched backfill shard."""
+        with closing(self._connect()) as con, con:
+            con.execute("INSERT OR REPLACE INTO backfill_shards VALUES (?, ?, ?, ?)",
+                        (scope, utc_iso(since), utc_iso(until), statements))
+
+    def clear_backfilled(self, scope):
+        """Drop the checkpoints of a finished backfill."""
+        with closing(self._connect()) as con, con:
+            con.execute("DELETE FROM backfill_shards WHERE scope = ?", (scope,))
@@ -0,0 +1,194 @@
+"""Incremental sync of LRS queries into the local statement store.
+
+A scope is one LRS query (its filter params, without ``since``/``until``).
+The store remembers the ``stored`` window each scope has been fetched for, so
+a sync only asks the LRS for the part of the requested window it is missing:
+the days before the covered window and everything after its watermark.
+Long windows are cut into shards that are fetched at the same time; the
+store de-duplicates on statement id and reads back in ``stored`` order, so
+shards can land in any order.
+"""
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from queue import Empty, Queue
+from urllib.parse import urlencode
+
+import requests
+
+from lrs import timing
+from lrs.client import MAX_IN_FLIGHT, iter_statements, make_session, shared_session
+from lrs.store import to_utc
+
+logger = logging.getLogger(__name__)
+
+# statements can take a moment to show up in LRS queries after being stored,
+# so the watermark is kept this far behind the time the fetch started
+SETTLE_TIME = timedelta(minutes=5)
+
+# statements are written to the store this many at a time while streaming
+BATCH_SIZE = 1000
+
+# long windows are fetched concurrently in shards of this size
+SHARD_SIZE = timedelta(days=int(os.environ.get("CL_LRS_SHARD_DAYS", 7)))
+
+# "related" lets the LRS filter on activity, "scan" pulls every statement in
+# the range and leaves the filtering to the store
+QUERY_MODE = os.environ.get("CL_LRS_QUERY_MODE", "related")
+
+
+def scope_key(params):
+    """Return the key a set of LRS query params is synced under."""
+    return urlencode(sorted(params.items()))
+
+
+def add_in_batches(store, statements):
+    """Write a stream of statements to the store a batch at a time."""
+    added = 0
+    while True:
+        batch = list(islice(statements, BATCH_SIZE))
+        if not batch:
+            return added
+        added += store.add(batch)
+
+
+def shard_window(since, until, shard_size=SHARD_SIZE):
+    """Split ``(since, until]`` into consecutive windows of ``shard_size``."""
+    if shard_size is None:
+        return [(since, until)]
+    shards = []
+    while since < until:
+        shards.append((since, min(since + shard_size, until)))
+        since += shard_size
+    return shards
+
+
+def missing_shards(store, params, since, until, shard_size):
+    """Return the shards of ``(since, until]`` not yet synced for ``params``.
+
+    Also returns the coverage to record once they are fetched, or None.
+    """
+    since = to_utc(since)
+    until = min(to_utc(until), datetime.now(timezone.utc) - SETTLE_TIME)
+    if until <= since:
+        return [], None
+
+    windows = []
+    covered = store.coverage(scope_key(params))
+    if covered is None:
+        windows.append((since, until))
+        new_since, new_watermark = since, until
+    else:
+        covered_since, watermark = to_utc(covered[0]), to_utc(covered[1])
+        if since < covered_since:
+            windows.append((since, covered_since))
+        if until > watermark:
+            windows.append((watermark, until))
+        new_since, new_watermark = min(since, covered_since), max(until, watermark)
+
+    shards = [shard for window in windows for shard in shard_window(*window, shard_size)]
+    return shards, (new_since, new_watermark) if windows else None
+
+
+def _fetch(store, base_url, tasks, session, max_in_flight):
+    """Fetch every ``(params, shard)`` in ``tasks``, at most ``max_in_flight`` at a time.
+
+    The workers are daemon threads rather than a ``concurrent.futures`` pool,
+    which refuses new work once the interpreter starts exiting, so a
+    prefetch still running then simply ends with the process.
+    """
+    def fetch(task):
+        params, shard = task
+        return add_in_batches(store, iter_statements(session, base_url, params, *shard))
+
+    if len(tasks) <= 1:
+        return sum(map(fetch, tasks))
+
+    queue = Queue()
+    for task in tasks:
+        queue.put(task)
+    added = []
+    errors = []
+    fetch = timing.propagate(fetch)
+
+    def work():
+        # stop taking shards once one has failed
+        while not errors:
+            try:
+                task = queue.get_nowait()
+            except Empty:
+                return
+            try:
+                added.append(fetch(task))
+            except BaseException as error:
+                errors.append(error)
+
+    threads = [threading.Thread(target=work, daemon=True, name=f"lrs-sync-{i}")
+               for i in range(min(len(tasks), max_in_flight))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return sum(added)
+
+
+def sync(store, base_url, params, since, until, session=None, shard_size=SHARD_SIZE):
+    """Make the store complete for ``params`` over ``(since, until]``.
+
+    Missing windows longer than ``shard_size`` are fetched as concurrent
+    shards; pass ``None`` to fetch each window with a single query.
+    Returns the number of statements that were new to the store.
+    """
+    shards, coverage = missing_shards(store, params, since, until, shard_size)
+    added = _fetch(store, base_url, [(params, shard) for shard in shards],
+                   session or shared_session(), MAX_IN_FLIGHT)
+    # joined to the coverage as it is now, which a backfill may have moved since
+    if coverage is not None:
+        store.extend_coverage(scope_key(params), *coverage)
+    return added
+
+
+def sync_many(store, base_url, scopes, since, until, max_in_flight=MAX_IN_FLIGHT,
+              shard_size=SHARD_SIZE):
+    """Sync several scopes in one pass, at most ``max_in_flight`` requests at a time.
+
+    The shards of every scope share the same workers, so the smaller scopes
+    are fetched alongside the largest one instead of after it.
+    Returns the number of statements that were new to the store.
+    """
+    if max_in_flight <= MAX_IN_FLIGHT:
+        session = shared_session()
+    else:
+        session = make_session(max_in_flight)
+
+    plans = [(params,) + missing_shards(store, params, since, until, shard_size) for params in scopes]
+    added = _fetch(store, base_url,
+                   [(params, shard) for params, shards, _ in plans for shard in shards],
+                   session, max_in_flight)
+    for params, _, coverage in plans:
+        if coverage is not None:
+            store.extend_coverage(scope_key(params), *coverage)
+    return added
+
+
+def sync_activity(store, base_url, activity, since, until, verbs=None, mode=QUERY_MODE):
+    """Sync the statements about ``activity`` and the activities under it.
+
+    In "related" mode the LRS does the filtering with ``related_activities``,
+    with one query per verb when ``verbs`` is given. "scan" mode, which is
+    also the fallback when the LRS rejects the filtered query, syncs every
+    statement in the range.
+    """
+    if mode == "related":
+        scopes = [{'activity': activity, 'related_activities': 'true'}]
+        if verbs:
+            scopes = [dict(scopes[0], verb=verb) for verb in verbs]
+        try:
+            return sum(sync(store, base_url, params, since, until) for params in scopes)
+        except requests.HTTPError as error:
+            logger.warning("activity query rejected, scanning instead: %s", error)
+    return sync(store, base_url, {}, since, until)
@@ -0,0 +1,52 @@
+"""Per-user attempt timelines as DataFrames.
+
+The store keeps one timeline per user and assessment up to date as scored
+completions arrive (see ``lrs.store``): first and last attempt, how many
+there were, and the first, last and best score. Repeat-attempt analysis
+reads those rows, a page at a time, instead of grouping every statement by
+``clUserId`` on each render. Only the attempts of a single user are read
+from the statements themselves.
+"""
+import pandas as pd
+
+from lrs.store import TIMELINE_ORDERS
+
+ORDERS = tuple(TIMELINE_ORDERS)
+PAGE_SIZE = 100
+
+TIMELINE_COLUMNS = ['actor', 'clUserId', 'firstAttempt', 'lastAttempt', 'attempts',
+                    'firstScore', 'lastScore', 'bestScore', 'scoreRawMax']
+
+
+def attempt_counts(store, activity, since, until, user_prefix=None):
+    """Users per number of attempts, with the mean improvement from first to last score."""
+    df = pd.DataFrame(store.timeline_counts(activity, since, until, user_prefix),
+                      columns=['attempts', 'users', 'improvement'])
+    return df.astype({'attempts': int, 'users': int, 'improvement': float})
+
+
+def user_timelines(store, activity, since, until, user_prefix=None, order_by='attempts',
+                   ascending=False, number=0, size=PAGE_SIZE):
+    """Page ``number`` of the timelines, counting from 0.
+
+    ``improvement`` is the last score minus the first, ``meanDelta`` the
+    mean change in score from one attempt to the next.
+    """
+    df = pd.DataFrame(store.user_timelines(activity, since, until, user_prefix, order_by,
+                                           not ascending, size, number * size),
+                      columns=TIMELINE_COLUMNS)
+    df['firstAttempt'] = pd.to_datetime(df['firstAttempt'], utc=True, format='ISO8601')
+    df['lastAttempt'] = pd.to_datetime(df['lastAttempt'], utc=True, format='ISO8601')
+    df['improvement'] = df['lastScore'] - df['firstScore']
+    # the deltas between attempts add up to last minus first
+    df['meanDelta'] = df['improvement'] / (df['attempts'] - 1).where(df['attempts'] > 1)
+    return df
+
+
+def attempt_history(store, actor, activity):
+    """Every attempt of one user, oldest first, with the change in score from the one before."""
+    df = pd.DataFrame(store.attempts(actor, activity),
+                      columns=['timestamp', 'scoreRaw', 'scoreRawMax'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True, format='ISO8601')
+    df['delta'] = df['scoreRaw'].diff()
+    return df
@@ -0,0 +1,176 @@
+"""Where the time of a page run goes.
+
+A page starts a ``Trace`` for its run and the loaders, the LRS client and
+the frame cache record into whichever trace is current: time spent syncing,
+parsing stored statements into a frame and cleaning it, rows loaded, cache
+hits and misses, and every LRS request with its latency and size. The
+current trace follows the work onto the sync's worker threads (see
+``propagate``); work started anywhere else, such as prefetching, records
+nothing.
+
+Finishing a trace logs its summary as one JSON line on the ``lrs.timing``
+logger and keeps it in ``TRACE_LOG``. A trace can also profile its run,
+with pyinstrument's sampling profiler when it is installed and cProfile
+otherwise.
+"""
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # cProfile stands in when pyinstrument is not installed
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+# one summary per finished trace
+TRACE_LOG = deque(maxlen=1000)
+# functions listed in a cProfile report
+PROFILE_LINES = 40
+
+_current = contextvars.ContextVar("lrs_trace", default=None)
+
+
+class Trace:
+    """Stage timings, counters and requests of one run."""
+
+    def __init__(self, name, profile=False):
+        self.name = name
+        self.stages = {}
+        self.counters = {}
+        self.requests = []
+        self.seconds = None
+        self.profile = None
+        self._lock = threading.Lock()
+        self._profiler = None
+        if profile and Profiler is not None:
+            self._profiler = Profiler()
+            self._profiler.start()
+        elif profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._started = time.perf_counter()
+
+    def add_stage(self, name, seconds):
+        """Add ``seconds`` to stage ``name``."""
+        with self._lock:
+            total, calls = self.stages.get(name, (0.0, 0))
+            self.stages[name] = (total + seconds, calls + 1)
+
+    def count(self, name, n=1):
+        """Add ``n`` to counter ``name``."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_request(self, metric):
+        """Record one LRS request, as logged in ``lrs.client.REQUEST_LOG``."""
+        with self._lock:
+            self.requests.append(metric)
+
+    def stop(self):
+        """Stop the clock and the profiler."""
+        if self.seconds is None:
+            self.seconds = time.perf_counter() - self._started
+        if self._profiler is not None:
+            self.profile = _profile_report(self._profiler)
+            self._profiler = None
+
+    def summary(self):
+        """Return the trace as a JSON friendly dict."""
+        with self._lock:
+            stages = {name: {"seconds": round(total, 4), "calls": calls}
+                      for name, (total, calls) in self.stages.items()}
+            latencies = sorted(m["wait"] + m["seconds"] for m in self.requests)
+            requests = {"pages": len(self.requests),
+                        "bytes": sum(m["bytes"] for m in self.requests),
+                        "statements": sum(m["statements"] for m in self.requests),
+                        "latency_median": _quantile(latencies, 0.5),
+                        "latency_max": _quantile(latencies, 1.0)}
+            return {"trace": self.name,
+                    "seconds": self.seconds and round(self.seconds, 4),
+                    "stages": stages,
+                    "counters": dict(self.counters),
+                    "requests": requests}
+
+
+def _quantile(values, q):
+    if not values:
+        return None
+    return round(values[min(int(q * len(values)), len(values) - 1)], 4)
+
+
+def _profile_report(profiler):
+    if Profiler is not None and isinstance(profiler, Profiler):
+        profiler.stop()
+        return profiler.output_text()
+    profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+    return out.getvalue()
+
+
+def start(name, profile=False):
+    """Start a trace and make it current for this thread, and return it."""
+    trace = Trace(name, profile)
+    _current.set(trace)
+    return trace
+
+
+def finish(trace):
+    """Stop ``trace``, log its summary and return the summary."""
+    trace.stop()
+    if _current.get() is trace:
+        _current.set(None)
+    summary = trace.summary()
+    TRACE_LOG.append(summary)
+    logger.info("%s", json.dumps(summary))
+    return summary
+
+
+def current():
+    """Return the current trace, or None."""
+    return _current.get()
+
+
+@contextmanager
+def stage(name):
+    """Time the block as stage ``name`` of the current trace."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace = _current.get()
+        if trace is not None:
+            trace.add_stage(name, time.perf_counter() - started)
+
+
+def count(name, n=1):
+    """Add ``n`` to counter ``name`` of the current trace."""
+    trace = _current.get()
+    if trace is not None:
+        trace.count(name, n)
+
+
+def record_request(metric):
+    """Record an LRS request in the current trace."""
+    trace = _current.get()
+    if trace is not None:
+        trace.add_request(metric)
+
+
+def propagate(fn):
+    """Wrap ``fn`` to run with the caller's trace, for handing to worker threads."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # a context can only be entered by one thread at a time
+        return context.copy().run(fn, *args, **kwargs)
+    return run
@@ -0,0 +1,89 @@
+import streamlit as st
+import pandas as pd
+from datetime import date
+from datetime import timedelta
+
+from lrs import loaders
+from lrs.rollups import score_histogram
+from views import debug_panel, get_store, page_start, refresh_button
+
+
+origin_date = date(2022, 5, 14)  # the first day that data is correct
+today = date.today()
+
+
+# DATA FUNCTIONS -----------------------------------------------------------
+
+
+def load_comparison(langs, ass_types, since, until):
+    """Load daily completion counts and score counts for several assessments at once."""
+    CL_BASE_URL = st.secrets.db_credentials.cl_lrs_base_url
+    return loaders.load_comparison(get_store(), CL_BASE_URL, langs, ass_types, since, until)
+
+
+trace = page_start('compare-assessments')
+
+
+st.title('Compare Assessments')  # -----------------------------------------
+
+# sidebar --------------------------------------------------------------------
+date_range_selection = st.sidebar.date_input(
+    "Date Range",
+    [today - timedelta(days=30), today],
+    min_value=origin_date,
+    max_value=today)
+
+language_selection = st.sidebar.multiselect(
+    'Languages',
+    loaders.ASSESSMENT_LANGUAGES,
+    default=list(loaders.ASSESSMENT_LANGUAGES[:2]))
+
+assessment_selection = st.sidebar.multiselect(
+    'Assessments',
+    loaders.ASSESSMENTS,
+    default=list(loaders.ASSESSMENTS[:1]))
+
+refresh_button()
+
+# comparison -----------------------------------------------------------------
+
+if language_selection and assessment_selection:
+    counts, scores = load_comparison(language_selection,
+                                     assessment_selection,
+                                     date_range_selection[0],
+                                     date_range_selection[1])
+    counts['series'] = counts['language'] + ' / ' + counts['assessment']
+    scores['series'] = scores['language'] + ' / ' + scores['assessment']
+    series = [f"{lang} / {item}" for lang in language_selection for item in assessment_selection]
+
+    # totals side by side
+    totals = counts.groupby('series')['count'].sum().reindex(series, fill_value=0)
+    columns = st.columns(min(len(series), 4))
+    for i, (name, total) in enumerate(totals.items()):
+        columns[i % len(columns)].metric(label=name, value=int(total))
+
+    if len(counts.index) == 0:
+        st.text("NO DATA for this date range")
+    else:
+        st.subheader('Completed per day')
+        daily = counts.pivot_table(index='day', columns='series', values='count',
+                                   aggfunc='sum', fill_value=0)
+        st.line_chart(daily.reindex(columns=[s for s in series if s in daily.columns]))
+
+    if len(scores.index) > 0:
+        st.subheader('Score distribution')
+        st.caption('Share of each assessment\'s scores in each bin of 20')
+        max_score = int(scores['scoreRawMax'].max())
+        num_bins = int(max_score / 20)
+
+        h_data = pd.DataFrame({'bins': list(range(0, max_score+1, 20))})
+        for name, group in scores.groupby('series'):
+            h_counts = score_histogram(group, bins=num_bins+1, value_range=(0, max_score))[0]
+            h_data[name] = h_counts / max(h_counts.sum(), 1)
+        st.bar_chart(h_data, x='bins', y=[s for s in series if s in h_data.columns], stack=False)
+else:
+    st.text("Choose at least one language and assessment")
+
+st.text("Assessment scores not valid before 14 May 2022.")
+
+debug_panel(trace)
@@ -0,0 +1,102 @@
+import streamlit as st
+from datetime import date
+from datetime import timedelta
+
+from lrs import loaders, timelines
+from views import debug_panel, get_store, page_start, refresh_button
+
+
+origin_date = date(2022, 5, 14)  # the first day that data is correct
+today = date.today()
+
+
+# DATA FUNCTIONS -----------------------------------------------------------
+
+
+def load_attempt_counts(lang, ass_type, since, until, user_prefix):
+    """Load how many users made each number of attempts at an assessment."""
+    CL_BASE_URL = st.secrets.db_credentials.cl_lrs_base_url
+    return loaders.load_attempt_counts(get_store(), CL_BASE_URL, lang, ass_type,
+                                       since, until, user_prefix)
+
+
+def load_user_timelines(lang, ass_type, since, until, user_prefix, order_by, ascending, number):
+    """Load one page of the users' timelines on an assessment."""
+    return loaders.load_user_timelines(get_store(), lang, ass_type, since, until,
+                                       user_prefix, order_by, ascending, number)
+
+
+trace = page_start('user-progress')
+
+
+st.title('User Progress')  # -----------------------------------------
+
+# sidebar --------------------------------------------------------------------
+date_range_selection = st.sidebar.date_input(
+    "Date Range",
+    [today - timedelta(days=30), today],
+    min_value=origin_date,
+    max_value=today)
+
+language_selection = st.sidebar.selectbox(
+    'Language',
+    loaders.ASSESSMENT_LANGUAGES)
+
+assessment_selection = st.sidebar.selectbox(
+    'Assessment',
+    loaders.ASSESSMENTS)
+
+user_prefix = st.sidebar.text_input('clUserId', placeholder='starts with')
+
+refresh_button()
+
+# timelines ------------------------------------------------------------------
+
+counts = load_attempt_counts(language_selection,
+                             assessment_selection,
+                             date_range_selection[0],
+                             date_range_selection[1],
+                             user_prefix)
+
+if len(counts.index) > 0:
+    st.header(assessment_selection)
+    repeats = counts[counts['attempts'] > 1]
+    users_column, repeats_column, improvement_column = st.columns(3)
+    users_column.metric(label='Users', value=int(counts['users'].sum()))
+    repeats_column.metric(label='Users with repeat attempts', value=int(repeats['users'].sum()))
+    if len(repeats.index) > 0:
+        improvement = (repeats['improvement'] * repeats['users']).sum() / repeats['users'].sum()
+        improvement_column.metric(label='Mean first to last change', value=f"{improvement:+.1f}")
+
+    st.subheader('Users by number of attempts')
+    st.bar_chart(counts, x='attempts', y='users')
+
+    st.subheader('Timelines')
+    sort_column, order_column = st.columns([3, 1])
+    order_by = sort_column.selectbox('Sort by', timelines.ORDERS)
+    ascending = order_column.radio('Order', ('descending', 'ascending')) == 'ascending'
+    pages = max(1, -(-int(counts['users'].sum()) // timelines.PAGE_SIZE))
+    number = st.number_input('Page', min_value=1, max_value=pages, value=1)
+    page = load_user_timelines(language_selection,
+                               assessment_selection,
+                               date_range_selection[0],
+                               date_range_selection[1],
+                               user_prefix, order_by, ascending, number - 1)
+    st.caption(f"page {number} of {pages}")
+    st.dataframe(page.drop(columns='actor'))
+
+    # one user's attempts are read from the statements
+    user = st.selectbox('Attempts of', [None] + list(page.index),
+                        format_func=lambda i: '(choose a user)' if i is None else page.loc[i, 'clUserId'])
+    if user is not None:
+        history = timelines.attempt_history(get_store(), page.loc[user, 'actor'],
+                                            loaders.activity_id('assessment', language_selection,
+                                                                assessment_selection))
+        st.line_chart(history, x='timestamp', y='scoreRaw')
+        st.dataframe(history)
+else:
+    st.text("NO DATA for this date range")
+
+st.text("Assessment scores not valid before 14 May 2022.")
+
+debug_panel(trace)
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import requests
+
+from benchmarks.mock_lrs import PATH, MockLRS
+from lrs import loaders
+from lrs.backfill import backfill
+from lrs.cache import FrameCache
+from lrs.store import StatementStore, to_utc, utc_iso
+from lrs.sync import scope_key, shard_window
+
+END = datetime(2024, 3, 1, tzinfo=timezone.utc)
+SINCE = END - timedelta(days=20)
+SHARD_SIZE = timedelta(days=1)
+# the last shard, so every other one has been started before it fails
+FAILING = (END - SHARD_SIZE, END)
+
+
+class Recorder:
+    """A ``MockLRS.fail`` that records the window of each query and can fail one."""
+
+    def __init__(self):
+        self.windows = []
+        self.failing = None
+
+    def __call__(self, query):
+        # follow-up pages carry a cursor, only the first page of a window counts
+        if "cursor" not in query:
+            window = (to_utc(query["since"]), to_utc(query["until"]))
+            self.windows.append(window)
+            if window == self.failing:
+                return 403
+        return None
+
+
+@pytest.fixture
+def recorder():
+    return Recorder()
+
+
+@pytest.fixture
+def lrs(recorder):
+    lrs = MockLRS(2000, days=30, end=END, actor_count=50, fail=recorder)
+    server = lrs.serve()
+    yield lrs, f"http://127.0.0.1:{server.server_port}{PATH}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return StatementStore(str(tmp_path / "store.sqlite3"))
+
+
+def test_rerun_resumes_after_failed_shard(monkeypatch, lrs, recorder, store):
+    lrs, base_url = lrs
+    shards = shard_window(SINCE, END, SHARD_SIZE)
+    recorder.failing = FAILING
+    with pytest.raises(requests.HTTPError):
+        backfill(store, base_url, SINCE, END, SHARD_SIZE, workers=4)
+    # the finished shards are checkpointed, but nothing is marked as synced
+    assert store.backfilled(scope_key({})) == set(shards) - {FAILING}
+    assert store.coverage(scope_key({})) is None
+
+    recorder.failing = None
+    recorder.windows.clear()
+    backfill(store, base_url, SINCE, END, SHARD_SIZE, workers=4)
+    assert recorder.windows == [FAILING]
+    assert store.backfilled(scope_key({})) == set()
+    assert len(store.statements(SINCE, END)) == sum(1 for stored in lrs.stored
+                                                    if SINCE < stored <= END)
+
+    # every query the pages make is covered, so a page only asks for what is newer
+    for params in [{}] + loaders.page_scopes():
+        covered_since, watermark = store.coverage(scope_key(params))
+        assert covered_since <= utc_iso(SINCE) and watermark >= utc_iso(END)
+    monkeypatch.setattr(loaders, "shared_cache", FrameCache)
+    requests_before = lrs.requests
+    counts, _ = loaders.load_daily_rollup(store, base_url, "english", "letter-sound",
+                                          END - timedelta(days=10), END)
+    assert lrs.requests - requests_before <= 1
+    assert len(counts.index) > 0
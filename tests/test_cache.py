@@ -0,0 +1,252 @@
+import itertools
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_statements
+from lrs import loaders
+from lrs.cache import FrameCache, combine, stored_times
+from lrs.store import StatementStore
+from lrs.sync import SETTLE_TIME, scope_key
+
+
+@pytest.mark.parametrize('ago, live', [
+    (-timedelta(hours=1), True),
+    (timedelta(0), True),
+    (SETTLE_TIME / 2, True),
+    (SETTLE_TIME + timedelta(minutes=1), False),
+    (timedelta(days=1), False),
+])
+def test_window_not_yet_synced_goes_stale(ago, live):
+    until = datetime.now(timezone.utc) - ago
+    cache = FrameCache()
+    cache.put('key', until - timedelta(days=30), until, pd.DataFrame({'a': [1]}))
+    cache.expire_live()
+    assert (cache.get('key', until - timedelta(days=30), until) is None) == live
+
+
+# a past range the store is complete for, so the loaders never call the LRS
+END = datetime(2024, 3, 1, tzinfo=timezone.utc)
+BASE_URL = 'http://lrs.invalid/statements'
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = FrameCache()
+    monkeypatch.setattr(loaders, 'shared_cache', lambda: cache)
+    return cache
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StatementStore(str(tmp_path / 'store.sqlite3'))
+    store.add(make_statements(3000, days=20, end=END, actor_count=200))
+    for params in loaders.page_scopes():
+        store.extend_coverage(scope_key(params), END - timedelta(days=60), END + timedelta(days=5))
+    return store
+
+
+def fresh_load(monkeypatch, load, *args):
+    monkeypatch.setattr(loaders, 'shared_cache', FrameCache)
+    return load(*args)
+
+
+def assert_same_rows(df, expected):
+    # a slice keeps the categories of the frame it was cut from
+    pd.testing.assert_frame_equal(df, expected, check_categorical=False)
+    for column in expected.select_dtypes('category'):
+        assert set(expected[column].cat.categories) <= set(df[column].cat.categories)
+
+
+@pytest.mark.parametrize('load', [loaders.load_assessment_completed_data,
+                                  loaders.load_assessment_data_alt])
+def test_slice_of_cached_window_matches_fresh_load(monkeypatch, cache, store, load):
+    args = (store, BASE_URL, 'english', 'letter-sound')
+    wide = load(*args, END - timedelta(days=20), END)
+    narrow = load(*args, END - timedelta(days=8), END - timedelta(days=3))
+    assert cache.stats()['slices'] == 1
+    assert 0 < len(narrow.index) < len(wide.index)
+    assert_same_rows(narrow, fresh_load(monkeypatch, load, *args,
+                                        END - timedelta(days=8), END - timedelta(days=3)))
+
+
+def frame(days, since=END - timedelta(days=30)):
+    """A frame with one row an hour over ``days`` days from ``since``, and its stored times."""
+    stored = pd.Series(pd.date_range(since + timedelta(hours=1), periods=days * 24, freq='h'))
+    return pd.DataFrame({'a': range(len(stored))}), stored
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Make every ``time.monotonic`` call a tick later than the last."""
+    ticks = itertools.count()
+    monkeypatch.setattr('lrs.cache.time.monotonic', lambda: next(ticks))
+
+
+def test_evicts_least_recently_used_past_max_bytes(clock):
+    since = END - timedelta(days=30)
+    probe = FrameCache()
+    probe.put('probe', since, since + timedelta(days=1), *frame(1, since))
+    cache = FrameCache(max_bytes=probe.nbytes * 2)
+    for key in ('a', 'b'):
+        cache.put(key, since, since + timedelta(days=1), *frame(1, since))
+    cache.get('a', since, since + timedelta(days=1))
+    cache.put('c', since, since + timedelta(days=1), *frame(1, since))
+
+    assert cache.get('b', since, since + timedelta(days=1)) is None
+    assert cache.get('a', since, since + timedelta(days=1)) is not None
+    assert cache.get('c', since, since + timedelta(days=1)) is not None
+    assert cache.stats()['evictions'] == 1
+    assert cache.nbytes <= cache.max_bytes
+
+
+def test_frame_larger_than_cache_is_not_kept():
+    since = END - timedelta(days=30)
+    cache = FrameCache(max_bytes=100)
+    cache.put('a', since, since + timedelta(days=10), *frame(10, since))
+    assert cache.stats() == dict(cache.counters, entries=0, bytes=0)
+
+
+def test_put_replaces_entries_it_covers():
+    since = END - timedelta(days=30)
+    cache = FrameCache()
+    cache.put('key', since + timedelta(days=2), since + timedelta(days=4),
+              *frame(2, since + timedelta(days=2)))
+    cache.put('key', since + timedelta(days=8), since + timedelta(days=9),
+              pd.DataFrame({'a': [1]}))
+    # a frame without stored times only answers its own window, so it
+    # replaces just an entry for exactly that window
+    cache.put('key', since + timedelta(days=8), since + timedelta(days=9),
+              pd.DataFrame({'a': [2]}))
+    cache.put('key', since + timedelta(days=1), since + timedelta(days=5), pd.DataFrame({'a': []}))
+    assert cache.stats()['entries'] == 3
+    assert cache.get('key', since + timedelta(days=8), since + timedelta(days=9))['a'].tolist() == [2]
+
+    # one with stored times can be sliced, so it replaces every entry inside it
+    wide = frame(10, since)
+    cache.put('key', since, since + timedelta(days=10), *wide)
+    probe = FrameCache()
+    probe.put('key', since, since + timedelta(days=10), *wide)
+    assert cache.stats() == dict(cache.counters, entries=1, bytes=probe.nbytes)
+
+
+def test_counters(clock):
+    since = END - timedelta(days=30)
+    cache = FrameCache(live_ttl=5)
+    cache.put('past', since, since + timedelta(days=10), *frame(10, since))
+    now = datetime.now(timezone.utc)
+    cache.put('live', now - timedelta(days=1), now, pd.DataFrame({'a': [1]}))
+
+    assert cache.get('past', since, since + timedelta(days=10)) is not None
+    assert cache.get('past', since + timedelta(days=1), since + timedelta(days=2)) is not None
+    assert cache.get('past', since, since + timedelta(days=11)) is None
+    assert cache.get('other', since, since + timedelta(days=1)) is None
+    assert cache.get('live', now - timedelta(days=1), now) is not None
+    # well past the TTL by the next tick count
+    for _ in range(10):
+        cache.get('past', since, since + timedelta(days=10))
+    assert cache.get('live', now - timedelta(days=1), now) is None
+
+    stats = cache.stats()
+    assert {name: stats[name] for name in cache.counters} == \
+        {'hits': 12, 'slices': 1, 'misses': 3, 'evictions': 0, 'expirations': 1}
+    assert stats['entries'] == 2
+
+
+def new_arrivals(n, end, seed):
+    """Statements stored in the minutes before ``end``, from a new user source and country."""
+    statements = make_statements(n, days=0.01, end=end, seed=seed, actor_count=200)
+    for statement in statements:
+        statement['actor']['account']['homePage'] = 'new-app'
+        statement['object']['location']['country'] = 'KE'
+    return statements
+
+
+@pytest.fixture
+def synced_to(monkeypatch):
+    """Stand in for the LRS: a sync only moves the watermark of every page scope."""
+    monkeypatch.setattr(loaders, 'sync', lambda *args: 0)
+    monkeypatch.setattr(loaders, 'sync_activity', lambda *args: 0)
+
+    def synced_to(store, watermark):
+        for params in loaders.page_scopes():
+            store.extend_coverage(scope_key(params), watermark - timedelta(days=60), watermark)
+    return synced_to
+
+
+def record_stale(monkeypatch, cache):
+    """Keep what ``cache.get_stale`` returns."""
+    stale = []
+    get_stale = cache.get_stale
+
+    def record(*key_window):
+        stale.append(get_stale(*key_window))
+        return stale[-1]
+    monkeypatch.setattr(cache, 'get_stale', record)
+    return stale
+
+
+LOADS = [loaders.load_assessment_completed_data, loaders.load_assessment_data_alt]
+
+
+@pytest.mark.parametrize('load', LOADS)
+def test_refresh_matches_cold_load(monkeypatch, cache, synced_to, tmp_path, load):
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    store = StatementStore(str(tmp_path / 'store.sqlite3'))
+    store.add(make_statements(3000, days=10, end=now - timedelta(hours=1), actor_count=200))
+    synced_to(store, now - timedelta(hours=1))
+    args = (store, BASE_URL, 'english', 'letter-sound', now - timedelta(days=10),
+            now + timedelta(hours=1))
+
+    before = load(*args)
+    store.add(new_arrivals(3000, now, seed=1))
+    synced_to(store, now)
+    loaders.refresh()
+    stale = record_stale(monkeypatch, cache)
+    refreshed = load(*args)
+
+    assert stale[0] is not None
+    assert len(refreshed.index) > len(before.index)
+    assert 'new-app' in refreshed['userSource'].cat.categories
+    pd.testing.assert_frame_equal(refreshed, fresh_load(monkeypatch, load, *args))
+
+
+@pytest.mark.parametrize('load', LOADS)
+def test_refresh_rereads_rows_past_the_watermark(monkeypatch, cache, synced_to, tmp_path, load):
+    watermark = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(hours=1)
+    store = StatementStore(str(tmp_path / 'store.sqlite3'))
+    store.add(make_statements(3000, days=10, end=watermark, actor_count=200))
+    # already in the store, but past what the sync vouches for
+    store.add(new_arrivals(3000, watermark + timedelta(minutes=40), seed=1))
+    synced_to(store, watermark)
+    args = (store, BASE_URL, 'english', 'letter-sound', watermark - timedelta(days=10),
+            watermark + timedelta(hours=2))
+
+    before = load(*args)
+    # stored before the newest cached row, but only inserted now
+    store.add(new_arrivals(3000, watermark + timedelta(minutes=20), seed=2))
+    synced_to(store, watermark + timedelta(hours=1))
+    loaders.refresh()
+    stale = record_stale(monkeypatch, cache)
+    refreshed = load(*args)
+
+    assert stale[0] is not None and stale[0][2] == watermark
+    assert len(refreshed.index) > len(before.index)
+    pd.testing.assert_frame_equal(refreshed, fresh_load(monkeypatch, load, *args))
+
+
+def test_combine_keeps_categoricals_and_order():
+    older = (pd.DataFrame({'type': pd.Categorical(['a', 'b']), 'n': [1, 2]}),
+             stored_times(pd.Series(['2024-01-01T00:00:02Z', '2024-01-01T00:00:01Z'])))
+    newer = (pd.DataFrame({'type': pd.Categorical(['c']), 'n': [3]}),
+             stored_times(pd.Series(['2024-01-01T00:00:03Z'])))
+    df, stored = combine(newer, older)
+    assert df['type'].tolist() == ['c', 'a', 'b']
+    assert list(df['type'].cat.categories) == ['a', 'b', 'c']
+    assert df['n'].tolist() == [3, 1, 2]
+    assert stored.is_monotonic_decreasing and len(stored.index) == 3
+
+    empty = (newer[0].iloc[:0], newer[1].iloc[:0])
+    assert combine(empty, older) is older
+    assert combine(newer, empty) is newer
@@ -0,0 +1,92 @@
+import copy
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_statements
+from lrs.cleaning import CHOICES, RENAME, data_clean_up
+from lrs.frames import statements_frame
+from lrs.loaders import (ASSESSMENT_COLUMNS, ASSESSMENT_OPTIONS, SURVEY_COLUMNS,
+                         SURVEY_OPTIONS)
+from lrs.schema import apply_schema
+
+CASES = [(ASSESSMENT_COLUMNS, ASSESSMENT_OPTIONS), (SURVEY_COLUMNS, SURVEY_OPTIONS)]
+
+
+def iterrows_clean_up(df, columns, options):
+    """The per-page implementation data_clean_up replaced, plus the schema."""
+    if df.shape[0] == 0:
+        return df
+    df = df.copy()
+    for i, r in df.iterrows():
+        if r['verb.display.en-US'] == 'answered' and isinstance(r[CHOICES], list):
+            for opt in r[CHOICES]:
+                df.at[i, opt['id']] = opt['description']['en-US']
+    df = df[df.columns[df.columns.isin([c for c in columns if c != CHOICES] + options)]]
+    return apply_schema(df.rename(columns=RENAME))
+
+
+def assert_same(statements, columns, options):
+    frame = statements_frame(statements, columns)
+    expected = iterrows_clean_up(frame, columns, options)
+    cleaned = data_clean_up(frame, options)
+    pd.testing.assert_frame_equal(cleaned, expected, check_like=True)
+
+
+def answered(statements):
+    return [s for s in statements if s['verb']['display']['en-US'] == 'answered']
+
+
+@pytest.mark.parametrize('columns, options', CASES)
+def test_matches_iterrows(columns, options):
+    assert_same(make_statements(2000, seed=7), columns, options)
+
+
+@pytest.mark.parametrize('columns, options', CASES)
+def test_answered_without_choices(columns, options):
+    statements = copy.deepcopy(make_statements(300, seed=1))
+    for s in answered(statements)[::2]:
+        del s['object']['definition']['choices']
+    assert_same(statements, columns, options)
+
+
+@pytest.mark.parametrize('columns, options', CASES)
+def test_choices_none(columns, options):
+    statements = copy.deepcopy(make_statements(300, seed=2))
+    for s in answered(statements)[::3]:
+        s['object']['definition']['choices'] = None
+    assert_same(statements, columns, options)
+
+
+@pytest.mark.parametrize('columns, options', CASES)
+def test_no_statement_has_choices(columns, options):
+    statements = [s for s in make_statements(300, seed=3)
+                  if s['verb']['display']['en-US'] != 'answered']
+    cleaned = data_clean_up(statements_frame(statements, columns), options)
+    assert not any(c.startswith('option-') for c in cleaned.columns)
+    assert_same(statements, columns, options)
+
+
+@pytest.mark.parametrize('columns, options', CASES)
+def test_repeated_choice_id_keeps_last(columns, options):
+    statements = copy.deepcopy(make_statements(300, seed=4))
+    for s in answered(statements):
+        s['object']['definition']['choices'].append(
+            {'id': 'option-1', 'description': {'en-US': 'repeated'}})
+    assert_same(statements, columns, options)
+    cleaned = data_clean_up(statements_frame(statements, columns), options)
+    assert set(cleaned.loc[cleaned['type'] == 'answered', 'option-1']) == {'repeated'}
+
+
+@pytest.mark.parametrize('columns, options', CASES)
+def test_empty_frame(columns, options):
+    frame = statements_frame([], columns)
+    cleaned = data_clean_up(frame, options)
+    assert len(cleaned.index) == 0
+    assert_same([], columns, options)
+
+
+def test_options_not_asked_for_are_dropped():
+    statements = make_statements(300, seed=5)
+    cleaned = data_clean_up(statements_frame(statements, ASSESSMENT_COLUMNS), ['option-0'])
+    assert [c for c in cleaned.columns if c.startswith('option-')] == ['option-0']
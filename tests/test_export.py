@@ -0,0 +1,56 @@
+import gzip
+import io
+
+import pandas as pd
+import pytest
+
+from lrs.export import FORMATS, export_file, write_csv
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({'clUserId': ['u1', 'u2', None],
+                         'scoreRaw': pd.array([10, None, 30], dtype='Int64'),
+                         'type': pd.Categorical(['completed', 'answered', 'completed'])})
+
+
+def read(data, export_format):
+    if export_format == 'CSV':
+        return pd.read_csv(io.BytesIO(data), index_col=0)
+    if export_format == 'CSV (gzip)':
+        return pd.read_csv(io.BytesIO(data), index_col=0, compression='gzip')
+    return pd.read_parquet(io.BytesIO(data))
+
+
+@pytest.mark.parametrize('export_format', list(FORMATS))
+def test_export_is_bytes_that_round_trip(frame, export_format):
+    data = export_file(frame, export_format)
+    # st.download_button takes bytes as they are
+    assert type(data) is bytes
+    back = read(data, export_format)
+    assert back['clUserId'].tolist()[:2] == ['u1', 'u2']
+    assert back['scoreRaw'].tolist()[::2] == [10, 30]
+    assert len(back.index) == 3
+
+
+def test_csv_matches_to_csv(frame):
+    assert export_file(frame, 'CSV') == frame.to_csv().encode('utf-8')
+    assert gzip.decompress(export_file(frame, 'CSV (gzip)')) == frame.to_csv().encode('utf-8')
+
+
+def test_csv_is_written_in_chunks(frame):
+    out = io.BytesIO()
+    write_csv(frame, out, chunk_rows=1)
+    assert out.getvalue() == frame.to_csv().encode('utf-8')
+
+
+@pytest.mark.skipif('Parquet' not in FORMATS, reason='pyarrow is not installed')
+def test_parquet_keeps_types(frame):
+    back = pd.read_parquet(io.BytesIO(export_file(frame, 'Parquet')))
+    pd.testing.assert_frame_equal(back, frame)
+
+
+def test_empty_frame(frame):
+    empty = frame.iloc[:0]
+    assert pd.read_csv(io.BytesIO(export_file(empty, 'CSV')), index_col=0).columns.tolist() == \
+        empty.columns.tolist()
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from lrs.geo import MAX_POINTS, cell_degrees, grid_points, map_points, place_points
+
+
+@pytest.fixture
+def located():
+    rng = np.random.default_rng(0)
+    n = 2000
+    df = pd.DataFrame({'lat': rng.uniform(-40, 40, n), 'lon': rng.uniform(-20, 100, n),
+                       'country': pd.Categorical(rng.choice(['NG', 'ZA', 'BD'], n)),
+                       'region': pd.Categorical(rng.choice(['a', 'b', None], n)),
+                       'city': rng.choice(['x', 'y', None], n)})
+    # rows without a position are left out
+    df.loc[:99, 'lat'] = np.nan
+    df.loc[100:149, 'lon'] = np.nan
+    return df
+
+
+@pytest.mark.parametrize('mode', ['grid', 'city', 'region', 'country'])
+def test_counts_add_up_to_located_rows(located, mode):
+    points = map_points(located, mode, zoom=4)
+    assert points['count'].sum() == 1850
+    assert (points['size'] > 0).all()
+    assert points['lat'].between(-40, 40).all() and points['lon'].between(-20, 100).all()
+
+
+def test_grid_cells_hold_their_points():
+    lat = pd.Series([0.1, 0.2, 0.3, 10.0])
+    lon = pd.Series([0.1, 0.3, 0.2, 10.0])
+    points = grid_points(lat, lon, 1.0).sort_values('count', ignore_index=True)
+    assert points['count'].tolist() == [1, 3]
+    assert points.loc[1, ['lat', 'lon']].tolist() == pytest.approx([0.2, 0.2])
+
+
+def test_grid_gets_coarser_past_max_points():
+    rng = np.random.default_rng(1)
+    n = MAX_POINTS * 3
+    df = pd.DataFrame({'lat': rng.uniform(-80, 80, n), 'lon': rng.uniform(-180, 180, n)})
+    # at zoom 12 nearly every row has a cell of its own
+    assert len(grid_points(df['lat'], df['lon'], cell_degrees(12)).index) > MAX_POINTS
+    points = map_points(df, 'grid', zoom=12)
+    assert len(points.index) <= MAX_POINTS
+    assert points['count'].sum() == n
+
+
+def test_places_group_categorical_and_missing_values(located):
+    points = place_points(located.dropna(subset=['lat', 'lon']), 'city')
+    # 3 countries x 3 regions (one missing) x 3 cities (one missing)
+    assert len(points.index) == 27
+    assert points['region'].isna().any() and points['city'].isna().any()
+    country = map_points(located, 'country')
+    assert sorted(country['country']) == ['BD', 'NG', 'ZA']
+
+
+@pytest.mark.parametrize('mode', ['grid', 'city', 'region', 'country'])
+def test_empty_frame(located, mode):
+    points = map_points(located.iloc[:0], mode)
+    assert len(points.index) == 0
+    assert {'lat', 'lon', 'count', 'size'} <= set(points.columns)
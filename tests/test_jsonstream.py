@@ -0,0 +1,73 @@
+import json
+import random
+
+import pytest
+
+from lrs.jsonstream import iter_statements
+
+
+def decode(chunks):
+    statements = []
+    gen = iter_statements(chunks)
+    while True:
+        try:
+            statements.append(next(gen))
+        except StopIteration as stop:
+            return statements, stop.value
+
+
+def split(data, rng):
+    """Cut ``data`` at random byte offsets, often inside a number or character."""
+    cuts = sorted(rng.sample(range(1, len(data)), min(len(data) - 1, rng.randint(1, 40))))
+    return [data[i:j] for i, j in zip([0] + cuts, cuts + [len(data)])]
+
+
+def make_body(rng, floats, unicode):
+    def scalar():
+        choices = [rng.randint(-10 ** 6, 10 ** 6), True, False, None, "plain"]
+        if floats:
+            choices += [rng.uniform(-1e3, 1e3), rng.uniform(0, 1) * 10 ** rng.randint(-30, 30)]
+        if unicode:
+            choices += ["é ü ß", "ελληνικά", "हिन्दी", "😀 emoji"]
+        return rng.choice(choices)
+
+    statements = [{"id": str(i), "result": {"score": {"raw": scalar(), "max": scalar()}},
+                   "context": {"extensions": {"a": [scalar(), scalar()]}}, "name": scalar()}
+                  for i in range(rng.randint(0, 8))]
+    return {"statements": statements, "n": scalar(), "more": scalar() if unicode else "/next"}
+
+
+@pytest.mark.parametrize("floats", [False, True])
+@pytest.mark.parametrize("unicode", [False, True])
+@pytest.mark.parametrize("seed", range(25))
+def test_matches_json_loads_however_split(floats, unicode, seed):
+    rng = random.Random(seed)
+    body = make_body(rng, floats, unicode)
+    data = json.dumps(body, ensure_ascii=False, indent=rng.choice([None, 1])).encode("utf-8")
+    expected = json.loads(data)
+    statements, rest = decode(split(data, rng))
+    assert statements == expected.pop("statements")
+    assert rest == expected
+
+
+@pytest.mark.parametrize("chunks", [
+    [b'{"statements": [], "n": 12345.', b'25}'],
+    [b'{"statements": [], "n": 1', b'e', b'3}'],
+    [b'{"statements": [], "n": -', b'7}'],
+    [b'{"statements": [], "n": 12', b'345}'],
+    [b'{"statements": [], "n": tr', b'ue}'],
+])
+def test_scalar_split_across_chunks(chunks):
+    expected = json.loads(b"".join(chunks))
+    assert decode(chunks) == (expected.pop("statements"), expected)
+
+
+def test_one_byte_chunks():
+    data = json.dumps({"statements": [{"x": 1.5e-3}, {"y": "ü"}], "more": ""}).encode()
+    assert decode([data[i:i + 1] for i in range(len(data))]) == \
+        ([{"x": 1.5e-3}, {"y": "ü"}], {"more": ""})
+
+
+def test_truncated_body_raises():
+    with pytest.raises(ValueError):
+        decode([b'{"statements": [{"a": 1}', b', {"b": 2.'])
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from lrs.paging import filter_options, page, page_count, view
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({'type': pd.Categorical(['answered', 'completed', None, 'answered',
+                                                 'completed', 'answered']),
+                         'clUserId': ['u10', 'u2', 'u11', None, 'x1', 'u1'],
+                         'scoreRaw': pd.array([5, None, 3, 5, 1, None], dtype='Int64'),
+                         'row': range(6)})
+
+
+def rows(frame, positions):
+    return frame['row'].take(positions).tolist()
+
+
+def test_no_filters_keep_every_row_in_order(frame):
+    assert rows(frame, view(frame)) == [0, 1, 2, 3, 4, 5]
+    assert rows(frame, view(frame, {'type': [], 'clUserId': '', 'missing': ['a']})) == \
+        [0, 1, 2, 3, 4, 5]
+
+
+def test_list_and_prefix_filters(frame):
+    assert rows(frame, view(frame, {'type': ['answered']})) == [0, 3, 5]
+    assert rows(frame, view(frame, {'type': ['answered', 'completed']})) == [0, 1, 3, 4, 5]
+    assert rows(frame, view(frame, {'clUserId': 'u1'})) == [0, 2, 5]
+    assert rows(frame, view(frame, {'type': ['answered'], 'clUserId': 'u1'})) == [0, 5]
+
+
+@pytest.mark.parametrize('column, ascending, expected', [
+    ('type', True, [0, 3, 5, 1, 4, 2]),
+    ('type', False, [1, 4, 0, 3, 5, 2]),
+    ('clUserId', True, [5, 0, 2, 1, 4, 3]),
+    ('clUserId', False, [4, 1, 2, 0, 5, 3]),
+    ('scoreRaw', True, [4, 2, 0, 3, 1, 5]),
+    ('scoreRaw', False, [0, 3, 2, 4, 1, 5]),
+])
+def test_sort_is_stable_with_missing_values_last(frame, column, ascending, expected):
+    assert rows(frame, view(frame, sort_by=column, ascending=ascending)) == expected
+
+
+def test_sort_after_filter(frame):
+    assert rows(frame, view(frame, {'clUserId': 'u'}, sort_by='clUserId')) == [5, 0, 2, 1]
+
+
+def test_pages_at_the_boundaries():
+    df = pd.DataFrame({'row': range(250)})
+    positions = view(df)
+    assert page_count(positions) == 3
+    assert page_count(positions[:200]) == 2
+    assert page_count(positions[:201]) == 3
+    assert page_count(positions[:0]) == 1
+    assert page(df, positions, 0)['row'].tolist() == list(range(100))
+    assert page(df, positions, 2)['row'].tolist() == list(range(200, 250))
+    assert len(page(df, positions, 3).index) == 0
+    assert len(page(df, positions[:0], 0).index) == 0
+    reversed_ = positions[::-1]
+    assert page(df, reversed_, 1, size=50)['row'].tolist() == list(range(199, 149, -1))
+
+
+def test_filter_options(frame):
+    assert filter_options(frame['type']) == ['answered', 'completed']
+    assert filter_options(frame['clUserId']) == ['u1', 'u10', 'u11', 'u2', 'x1']
+    assert filter_options(pd.Series([np.nan, 2.0, 1.0])) == [1.0, 2.0]
@@ -0,0 +1,141 @@
+import copy
+import sqlite3
+import uuid
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from lrs.dedup import TOLERANCE
+from lrs.store import StatementStore, actor_key, utc_iso
+
+# a multiple of TOLERANCE, so bucket edges fall on whole offsets from it
+BASE = datetime.fromtimestamp(TOLERANCE * 340_000_000, timezone.utc)
+COMPLETED = "http://adlnet.gov/expapi/verbs/completed"
+ACTIVITY = "https://data.curiouslearning.org/xAPI/activities/assessment/english/letter-sound"
+
+
+def attempt(seconds, score=50, user="u1", response=None):
+    """A completion ``seconds`` after ``BASE``."""
+    at = BASE + timedelta(seconds=seconds)
+    result = {"score": {"raw": score, "max": 100}}
+    if response is not None:
+        result["response"] = response
+    return {"id": str(uuid.uuid4()),
+            "actor": {"account": {"homePage": "cr", "name": user}},
+            "verb": {"id": COMPLETED},
+            "object": {"id": ACTIVITY},
+            "result": result,
+            "timestamp": utc_iso(at),
+            "stored": utc_iso(at + timedelta(seconds=1))}
+
+
+def again(statement, seconds):
+    """The same report sent again under a new id, ``seconds`` later."""
+    copy_ = copy.deepcopy(statement)
+    copy_["id"] = str(uuid.uuid4())
+    copy_["timestamp"] = utc_iso(datetime.fromisoformat(statement["timestamp"][:-1] + "+00:00")
+                                 + timedelta(seconds=seconds))
+    return copy_
+
+
+def duplicate_of(store):
+    with closing(sqlite3.connect(store.path)) as con:
+        return dict(con.execute("SELECT id, duplicate_of FROM statements"))
+
+
+def rows(store, table):
+    with closing(sqlite3.connect(store.path)) as con:
+        return sorted(con.execute(f"SELECT * FROM {table}").fetchall(), key=repr)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return StatementStore(str(tmp_path / "store.sqlite3"))
+
+
+def test_near_duplicate_in_same_batch(store):
+    first = attempt(0)
+    second = again(first, 2)
+    assert store.add([first, second]) == 2
+    assert duplicate_of(store) == {first["id"]: None, second["id"]: first["id"]}
+
+
+def test_near_duplicate_across_batches(store):
+    first = attempt(0)
+    second = again(first, 3)
+    store.add([first])
+    store.add([second])
+    assert duplicate_of(store)[second["id"]] == first["id"]
+    assert len(store.statements(BASE - timedelta(days=1), BASE + timedelta(days=1))) == 1
+
+
+@pytest.mark.parametrize("start, gap, duplicate", [
+    (TOLERANCE - 0.1, 0.2, True),        # either side of a bucket edge
+    (TOLERANCE - 0.1, TOLERANCE, True),  # in the bucket after next, exactly at the tolerance
+    (0.0, TOLERANCE + 0.5, False),
+    (TOLERANCE - 0.1, TOLERANCE + 0.2, False),
+])
+def test_near_duplicate_at_bucket_edges(store, start, gap, duplicate):
+    first = attempt(start)
+    second = again(first, gap)
+    store.add([first])
+    store.add([second])
+    assert (duplicate_of(store)[second["id"]] == first["id"]) is duplicate
+
+
+def test_different_results_are_not_duplicates(store):
+    first = attempt(0, response="a")
+    other_score = again(first, 1)
+    other_score["result"]["score"]["raw"] = 51
+    other_response = again(first, 1)
+    other_response["result"]["response"] = "b"
+    store.add([first, other_score, other_response])
+    assert set(duplicate_of(store).values()) == {None}
+
+
+def test_nearest_original_is_chosen(store):
+    first = attempt(0)
+    second = again(first, 4)
+    store.add([first])
+    # far enough from the first to be kept on its own
+    third = again(first, 8)
+    store.add([third])
+    late = again(first, 7)
+    store.add([late])
+    assert duplicate_of(store)[late["id"]] == third["id"]
+    assert duplicate_of(store)[third["id"]] is None
+    store.add([second])
+    assert duplicate_of(store)[second["id"]] == first["id"]
+
+
+def test_duplicates_left_out_of_rollups(store):
+    first = attempt(0)
+    store.add([first, again(first, 1)])
+    assert [count for _, _, count in store.daily_counts(ACTIVITY, COMPLETED, BASE, BASE)] == [1]
+    assert store.actors(ACTIVITY, BASE - timedelta(days=1), BASE + timedelta(days=1)) == \
+        [first["actor"]]
+    assert rows(store, "user_timelines")[0][5] == 1
+
+
+def test_timeline_follows_attempt_times_not_arrival(store):
+    attempts = [attempt(i * 60, score=score) for i, score in enumerate([20, 35, 90, 60])]
+    for order in ([3, 1, 0, 2], [2, 3, 0, 1]):
+        store = StatementStore(store.path + str(order))
+        for i in order:
+            store.add([attempts[i]])
+        (timeline,) = store.user_timelines(ACTIVITY, BASE - timedelta(days=1),
+                                           BASE + timedelta(days=1))
+        (_, user, first_at, last_at, count, first_score, last_score, best_score,
+         score_max) = timeline
+        assert (user, count, first_score, last_score, best_score, score_max) == \
+            ("u1", 4, 20, 60, 90, 100)
+        assert (first_at, last_at) == (attempts[0]["timestamp"], attempts[3]["timestamp"])
+    history = store.attempts(actor_key(attempts[0]["actor"]), ACTIVITY)
+    assert [score for _, score, _ in history] == [20, 35, 90, 60]
+
+
+def test_reopened_store_counts_once(store):
+    StatementStore(store.path).add([attempt(0)])
+    assert [count for _, _, count in store.daily_counts(ACTIVITY, COMPLETED, BASE, BASE)] == [1]
+    assert rows(store, "user_timelines")[0][5] == 1
@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import requests
+
+from benchmarks.mock_lrs import PATH, MockLRS
+from lrs.store import StatementStore, to_utc, utc_iso
+from lrs.sync import SETTLE_TIME, scope_key, shard_window, sync, sync_activity
+
+END = datetime(2024, 3, 1, tzinfo=timezone.utc)
+ACTIVITY = "https://data.curiouslearning.org/xAPI/activities/assessment/english/letter-sound"
+PARAMS = {"activity": ACTIVITY, "verb": "http://adlnet.gov/expapi/verbs/completed"}
+
+
+class Recorder:
+    """A ``MockLRS.fail`` that records the window of each query and fails some."""
+
+    def __init__(self):
+        self.windows = []
+        self.status = None
+
+    def __call__(self, query):
+        # follow-up pages carry a cursor, only the first page of a window counts
+        if "cursor" not in query:
+            self.windows.append((to_utc(query["since"]), to_utc(query["until"])))
+        return self.status(query) if self.status else None
+
+
+@pytest.fixture
+def recorder():
+    return Recorder()
+
+
+def serve(recorder, end=END):
+    lrs = MockLRS(2000, days=30, end=end, actor_count=50, fail=recorder)
+    server = lrs.serve()
+    return lrs, server, f"http://127.0.0.1:{server.server_port}{PATH}"
+
+
+@pytest.fixture
+def lrs(recorder):
+    lrs, server, base_url = serve(recorder)
+    yield lrs, base_url
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return StatementStore(str(tmp_path / "store.sqlite3"))
+
+
+def served(lrs, since, until, **params):
+    """How many statements the mock holds for ``params`` stored in ``(since, until]``."""
+    return sum(1 for i in lrs.candidates(params) if since < lrs.stored[i] <= until and (
+        "verb" not in params or lrs.statement(i)["verb"]["id"] == params["verb"]))
+
+
+def test_shard_window():
+    assert shard_window(END, END + timedelta(days=15), timedelta(days=7)) == [
+        (END, END + timedelta(days=7)),
+        (END + timedelta(days=7), END + timedelta(days=14)),
+        (END + timedelta(days=14), END + timedelta(days=15))]
+    assert shard_window(END, END + timedelta(days=7), timedelta(days=7)) == \
+        [(END, END + timedelta(days=7))]
+    assert shard_window(END, END, timedelta(days=7)) == []
+    assert shard_window(END, END + timedelta(days=30), None) == [(END, END + timedelta(days=30))]
+
+
+def test_cold_then_warm_sync(lrs, recorder, store):
+    lrs, base_url = lrs
+    since = END - timedelta(days=20)
+    added = sync(store, base_url, PARAMS, since, END)
+    assert added == served(lrs, since, END, **PARAMS) > 0
+    # one query per week long shard
+    assert sorted(recorder.windows) == shard_window(since, END)
+    assert store.coverage(scope_key(PARAMS)) == (utc_iso(since), utc_iso(END))
+
+    requests_before = lrs.requests
+    assert sync(store, base_url, PARAMS, since, END) == 0
+    assert sync(store, base_url, PARAMS, since + timedelta(days=3), END - timedelta(days=3)) == 0
+    assert lrs.requests == requests_before
+
+
+def test_wider_window_fetches_only_the_edges(lrs, recorder, store):
+    lrs, base_url = lrs
+    sync(store, base_url, PARAMS, END - timedelta(days=20), END - timedelta(days=10))
+    recorder.windows.clear()
+    sync(store, base_url, PARAMS, END - timedelta(days=25), END - timedelta(days=5))
+    assert sorted(recorder.windows) == [(END - timedelta(days=25), END - timedelta(days=20)),
+                                        (END - timedelta(days=10), END - timedelta(days=5))]
+    assert store.coverage(scope_key(PARAMS)) == (utc_iso(END - timedelta(days=25)),
+                                                 utc_iso(END - timedelta(days=5)))
+    assert len(store.statements(END - timedelta(days=25), END - timedelta(days=5), **PARAMS)) == \
+        served(lrs, END - timedelta(days=25), END - timedelta(days=5), **PARAMS)
+
+
+def test_window_ending_within_settle_time(recorder, store):
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    lrs, server, base_url = serve(recorder, end=now)
+    try:
+        sync(store, base_url, {}, now - timedelta(days=2), now + timedelta(days=1))
+    finally:
+        server.shutdown()
+        server.server_close()
+    # nothing is asked for past the settle time, and the watermark stops there
+    assert max(until for _, until in recorder.windows) <= now - SETTLE_TIME + timedelta(seconds=5)
+    watermark = to_utc(store.coverage(scope_key({}))[1])
+    assert watermark <= now - SETTLE_TIME + timedelta(seconds=5)
+    stored = store.statements(now - timedelta(days=2), now + timedelta(days=1))
+    assert stored and all(to_utc(s["stored"]) <= watermark for s in stored)
+
+
+def test_rejected_activity_query_falls_back_to_scan(lrs, recorder, store):
+    lrs, base_url = lrs
+    recorder.status = lambda query: 400 if "related_activities" in query else None
+    since = END - timedelta(days=5)
+    sync_activity(store, base_url, ACTIVITY, since, END)
+    assert store.coverage(scope_key({"activity": ACTIVITY, "related_activities": "true"})) is None
+    assert store.coverage(scope_key({})) == (utc_iso(since), utc_iso(END))
+    assert len(store.statements(since, END)) == served(lrs, since, END)
+
+
+def test_failed_shard_fails_the_sync(lrs, recorder, store):
+    lrs, base_url = lrs
+    since = END - timedelta(days=20)
+    failing = utc_iso(since + timedelta(days=7))
+    recorder.status = lambda query: 403 if query["since"] == failing else None
+    with pytest.raises(requests.HTTPError):
+        sync(store, base_url, PARAMS, since, END)
+    # the shards that came in are kept, but the window is not marked as synced
+    assert store.coverage(scope_key(PARAMS)) is None
+    assert 0 < len(store.statements(since, END, **PARAMS)) < served(lrs, since, END, **PARAMS)
+
+
+def test_sync_keeps_coverage_recorded_meanwhile(lrs, recorder, store):
+    lrs, base_url = lrs
+    scope = scope_key(PARAMS)
+
+    def backfill_meanwhile(query):
+        store.extend_coverage(scope, END - timedelta(days=30), END - timedelta(days=2))
+    recorder.status = backfill_meanwhile
+    sync(store, base_url, PARAMS, END - timedelta(days=5), END)
+    # the window is joined to the backfill's, not written over it
+    assert store.coverage(scope) == (utc_iso(END - timedelta(days=30)), utc_iso(END))
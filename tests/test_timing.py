@@ -0,0 +1,43 @@
+import io
+import json
+import logging
+
+import pytest
+
+from lrs import timing
+from views import add_log_handler
+
+
+@pytest.fixture
+def log():
+    logger = logging.getLogger("lrs")
+    level, propagate = logger.level, logger.propagate
+    stream = io.StringIO()
+    handler = add_log_handler(stream)
+    yield stream
+    logger.removeHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = propagate
+
+
+def test_finished_trace_logs_one_json_line(log):
+    trace = timing.start("page")
+    with timing.stage("sync"):
+        timing.count("rows", 3)
+    timing.record_request({"wait": 0.1, "seconds": 0.2, "bytes": 10, "statements": 2})
+    summary = timing.finish(trace)
+
+    (line,) = log.getvalue().splitlines()
+    assert " lrs.timing INFO " in line
+    assert json.loads(line.split(" lrs.timing INFO ", 1)[1]) == summary
+    assert summary["trace"] == "page"
+    assert summary["counters"] == {"rows": 3}
+    assert summary["stages"]["sync"]["calls"] == 1
+    assert summary["requests"]["pages"] == 1 and summary["requests"]["statements"] == 2
+    assert timing.current() is None
+
+
+def test_nothing_recorded_without_a_trace(log):
+    with timing.stage("sync"):
+        timing.count("rows")
+    assert log.getvalue() == ""
@@ -0,0 +1,110 @@
+"""Streamlit views shared by the pages."""
+import logging
+import os
+
+import pandas as pd
+import streamlit as st
+
+from lrs import StatementStore, loaders, paging, prefetch, timing
+from lrs.cache import shared_cache
+from lrs.client import request_summary
+
+# level of the request and trace summary lines the lrs loggers write
+LOG_LEVEL = os.environ.get("CL_LRS_LOG_LEVEL", "INFO").upper()
+
+
+def add_log_handler(stream=None, level=LOG_LEVEL):
+    """Write the ``lrs`` loggers' lines to ``stream``, stderr by default, from ``level`` up."""
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(levelname)s %(message)s"))
+    logger = logging.getLogger("lrs")
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    # streamlit leaves the root logger without a handler, and a line should
+    # not be printed twice if something else adds one
+    logger.propagate = False
+    return handler
+
+
+@st.cache_resource
+def configure_logging():
+    """Send the ``lrs`` log lines to stderr, once per process."""
+    return add_log_handler()
+
+
+@st.cache_resource
+def get_store():
+    """Open the local statement store shared by all sessions."""
+    return StatementStore()
+
+
+def start_prefetch():
+    """Start warming every page's default view in the background, once per process."""
+    return prefetch.shared_prefetcher(get_store(), st.secrets.db_credentials.cl_lrs_base_url)
+
+
+def page_start(name):
+    """Start a run of page ``name``: its trace, shown by ``debug_panel``, and the prefetcher."""
+    configure_logging()
+    trace = start_trace(name)
+    # every page's default view is loaded in the background, once per process
+    start_prefetch()
+    return trace
+
+
+def refresh_button():
+    """Show the sidebar's Refresh button, which has the windows reaching into today reloaded."""
+    if st.sidebar.button('Refresh', help='Add the statements stored since the data was loaded'):
+        loaders.refresh()
+
+
+def start_trace(name):
+    """Start timing this run of page ``name``; a ``profile`` query parameter profiles it too."""
+    profile = 'profile' in st.query_params
+    if profile:
+        # only the one run is profiled, not every rerun after it
+        del st.query_params['profile']
+    return timing.start(name, profile)
+
+
+def debug_panel(trace):
+    """Finish ``trace`` and show where the run's time went in a collapsed panel."""
+    summary = timing.finish(trace)
+    with st.expander('Debug: timings'):
+        stages = {name: stage['seconds'] for name, stage in summary['stages'].items()}
+        # whatever the loaders did not account for, mostly building the page
+        stages['other'] = max(summary['seconds'] - sum(stages.values()), 0)
+        st.caption(f"{summary['seconds']:.3f}s for this run")
+        st.dataframe(pd.Series(stages, name='seconds'))
+
+        st.write('Counters', summary['counters'])
+        st.write('LRS requests', summary['requests'])
+        if trace.requests:
+            st.dataframe(pd.DataFrame(trace.requests))
+        st.write('Frame cache', shared_cache().stats())
+        st.write('LRS requests since start', request_summary())
+        if trace.profile:
+            st.code(trace.profile)
+
+
+def raw_data_view(data):
+    """Show ``data`` a page at a time, with filters, a sort and a row count."""
+    filters = {}
+    columns = [c for c in paging.FILTER_COLUMNS if c in data.columns]
+    for column, name in zip(st.columns(max(len(columns), 1)), columns):
+        if name == 'clUserId':
+            # too many ids to list, match the start instead
+            filters[name] = column.text_input(name, placeholder='starts with')
+        else:
+            filters[name] = column.multiselect(name, paging.filter_options(data[name]))
+
+    sort_column, order_column = st.columns([3, 1])
+    sort_by = sort_column.selectbox('Sort by', [None] + list(data.columns),
+                                    format_func=lambda c: '(stored order)' if c is None else c)
+    ascending = order_column.radio('Order', ('ascending', 'descending')) == 'ascending'
+
+    positions = paging.view(data, filters, sort_by, ascending)
+    pages = paging.page_count(positions)
+    number = st.number_input('Page', min_value=1, max_value=pages, value=1)
+    st.caption(f"{len(positions):,} of {len(data.index):,} rows, page {number} of {pages}")
+    st.dataframe(paging.page(data, positions, number - 1))